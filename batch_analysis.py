@@ -0,0 +1,214 @@
+"""Headless batch analysis of every record and eval file, for cron jobs and CI.
+
+Reuses the app's parsing without importing Streamlit. Record files are
+split into chunks of whole lines that are parsed in a process pool, and
+two tables are written: one row per dialog and one row per epoch.
+
+    python batch_analysis.py [--data-dir .] [--out analysis] [--format csv|parquet] [--workers N]
+
+Without --data-dir the data source comes from the environment like the
+app's (DATA_SOURCE, DATA_DIR, GITHUB_REPO, GITHUB_TOKEN, GITHUB_API_ROOT).
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from data_sources import DataSourceError, list_data_files, source_from_config
+from eval_metrics import parse_eval_metrics
+from record_parser import parse_record
+from record_store import DIALOG_FACETS, dialog_facets
+from run_index import parse_run_name
+
+RECORD_PATH = "data/conversation_history"
+EVAL_PATH = "data/eval_metrics"
+
+# 每个任务最多解析这么多字节的整行；大文件拆成多个任务，各进程负载更均匀
+CHUNK_BYTES = 1024 * 1024
+
+RUN_COLUMNS = ('run', 'model', 'epoch', 'version', 'archive')
+DIALOG_COLUMNS = ('path',) + RUN_COLUMNS + DIALOG_FACETS + ('messages',)
+EPOCH_COLUMNS = RUN_COLUMNS + (
+    'eval_path', 'sr', 'avg_turns', 'rewards',
+    'record_path', 'dialogs', 'mean_reward', 'accept_rate', 'mean_turns',
+)
+
+
+def parse_chunk(path, offsets):
+    """(reward, messages, turns, recommended, accepted, min/max critic reward) of each line, None if it does not parse"""
+    start = offsets[0][0]
+    end = offsets[-1][0] + offsets[-1][1]
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    rows = []
+    for offset, length in offsets:
+        try:
+            dialog = parse_record(data[offset - start:offset - start + length])
+        except Exception:
+            rows.append(None)
+            continue
+        messages = dialog.get('full_state', [])
+        rows.append((dialog.get('reward'), len(messages)) + dialog_facets(messages))
+    return rows
+
+
+def split_offsets(offsets, chunk_bytes=CHUNK_BYTES):
+    """Consecutive slices of a line index, each covering about chunk_bytes"""
+    chunks = []
+    first = 0
+    size = 0
+    for i, (_, length) in enumerate(offsets):
+        size += length
+        if size >= chunk_bytes:
+            chunks.append(offsets[first:i + 1])
+            first = i + 1
+            size = 0
+    if first < len(offsets):
+        chunks.append(offsets[first:])
+    return chunks
+
+
+def local_record_file(source, entry):
+    """(local path, line index) of a record file, downloading it if only its index is cached"""
+    record = source.record_file(entry['path'], sha=entry['sha'])
+    if record.path is None:
+        # 工作进程只读本地文件，不发网络请求
+        _, local_path = source.download(entry['path'])
+        return local_path, record.offsets
+    return record.path, record.offsets
+
+
+def run_fields(path):
+    key = parse_run_name(path)
+    return {column: getattr(key, column) if key else None for column in RUN_COLUMNS}
+
+
+def analyze_records(source, entries, workers, chunk_bytes=CHUNK_BYTES):
+    """One row per dialog of every record file; dialogs are numbered as in the app, skipping unparsable lines"""
+    tasks = []
+    for entry in entries:
+        local_path, offsets = local_record_file(source, entry)
+        tasks.extend((entry, local_path, chunk) for chunk in split_offsets(offsets, chunk_bytes))
+
+    paths = [local_path for _, local_path, _ in tasks]
+    chunks = [chunk for _, _, chunk in tasks]
+    if workers == 1:
+        results = list(map(parse_chunk, paths, chunks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(parse_chunk, paths, chunks))
+
+    rows = []
+    counts = {}
+    for (entry, _, _), parsed in zip(tasks, results):
+        fields = run_fields(entry['path'])
+        for values in parsed:
+            if values is None:
+                continue
+            dialog = counts.get(entry['path'], 0)
+            counts[entry['path']] = dialog + 1
+            reward, messages, *facets = values
+            row = dict(fields, path=entry['path'], messages=messages)
+            row.update(zip(DIALOG_FACETS, [dialog, reward] + facets))
+            rows.append(row)
+    return rows
+
+
+def analyze_epochs(source, entries, dialog_rows):
+    """One row per (run, model, epoch, version, archive): eval metrics joined with its record file's dialogs"""
+    epochs = {}
+
+    def epoch_row(path):
+        fields = run_fields(path)
+        if fields['epoch'] is None:
+            return None
+        return epochs.setdefault(tuple(fields[column] for column in RUN_COLUMNS), fields)
+
+    contents, errors = source.read_many(entries)
+    for path, error in errors.items():
+        print(f"Skipped {path}: {error}", file=sys.stderr)
+    for path, content in sorted(contents.items()):
+        row = epoch_row(path)
+        if row is None:
+            continue
+        metrics = parse_eval_metrics(content.decode('utf-8'))
+        row.update(eval_path=path, sr=metrics.sr, avg_turns=metrics.avg_turns, rewards=metrics.rewards)
+        for turn, value in enumerate(metrics.sr_turns):
+            row[f'sr_turn_{turn}'] = value
+
+    by_file = {}
+    for dialog in dialog_rows:
+        by_file.setdefault(dialog['path'], []).append(dialog)
+    for path, dialogs in by_file.items():
+        row = epoch_row(path)
+        if row is None:
+            continue
+        rewards = [dialog['reward'] for dialog in dialogs if isinstance(dialog['reward'], (int, float))]
+        row.update(
+            record_path=path,
+            dialogs=len(dialogs),
+            mean_reward=sum(rewards) / len(rewards) if rewards else None,
+            accept_rate=sum(dialog['accepted'] for dialog in dialogs) / len(dialogs),
+            mean_turns=sum(dialog['turns'] for dialog in dialogs) / len(dialogs),
+        )
+
+    # 回合成功率的列数取所有 epoch 中最多的
+    turns = max((int(column[8:]) + 1 for row in epochs.values() for column in row if column.startswith('sr_turn_')),
+                default=0)
+    columns = EPOCH_COLUMNS + tuple(f'sr_turn_{turn}' for turn in range(turns))
+    # archive 为 None 时排在同一 run 的归档之前
+    order = sorted(epochs, key=lambda key: tuple('' if part is None else part for part in key))
+    return columns, [epochs[key] for key in order]
+
+
+def write_table(path, columns, rows, file_format):
+    if file_format == 'parquet':
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            sys.exit("Parquet output needs pyarrow: pip install pyarrow")
+        pq.write_table(pa.table({column: [row.get(column) for row in rows] for column in columns}), path)
+        return
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-dialog and per-epoch tables of every record and eval file")
+    parser.add_argument("--data-dir", help="directory that contains data/; default: the configured data source")
+    parser.add_argument("--out", default="analysis", help="output directory")
+    parser.add_argument("--format", choices=("csv", "parquet"), default="csv")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-mb", type=float, default=CHUNK_BYTES / 1024 / 1024)
+    args = parser.parse_args()
+
+    config = dict(os.environ)
+    if args.data_dir:
+        config.update(DATA_SOURCE="local", DATA_DIR=args.data_dir)
+    start = time.perf_counter()
+    try:
+        source = source_from_config(config)
+        index = source.index()
+        records = list_data_files(index, RECORD_PATH)
+        dialogs = analyze_records(source, records, max(args.workers, 1), int(args.chunk_mb * 1024 * 1024))
+        epoch_columns, epochs = analyze_epochs(source, list_data_files(index, EVAL_PATH), dialogs)
+    except DataSourceError as e:
+        sys.exit(str(e))
+
+    os.makedirs(args.out, exist_ok=True)
+    write_table(os.path.join(args.out, f"dialogs.{args.format}"), DIALOG_COLUMNS, dialogs, args.format)
+    write_table(os.path.join(args.out, f"epochs.{args.format}"), epoch_columns, epochs, args.format)
+    elapsed = time.perf_counter() - start
+    megabytes = sum(entry['size'] for entry in records) / 1024 / 1024
+    print(f"{len(records)} record files ({megabytes:.1f} MB), {len(dialogs)} dialogs, {len(epochs)} epochs "
+          f"in {elapsed:.1f} s with {args.workers} workers -> {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Throughput of batch_analysis.py as the number of worker processes grows.
+
+The record files of a data directory are linked --copies times into a
+temporary data tree, so the workload can be made larger than the bundled
+archive, and the per-dialog analysis is timed with 1, 2, 4, ... workers
+up to the number of cores (or --max-workers).
+
+    python benchmarks/bench_batch.py [--root .] [--copies 4] [--max-workers N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def build_tree(root, copies, tmp):
+    """Link every record file of root into tmp/data/conversation_history_copyN for N < copies"""
+    from batch_analysis import RECORD_PATH
+    from data_sources import LocalSource, list_data_files
+
+    entries = list_data_files(LocalSource(root).index(), RECORD_PATH)
+    for copy in range(copies):
+        directory = os.path.join(tmp, f"{RECORD_PATH}_copy{copy}")
+        os.makedirs(directory)
+        for entry in entries:
+            os.symlink(os.path.join(root, entry['path']), os.path.join(directory, entry['name']))
+    return sum(entry['size'] for entry in entries) * copies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--root", default=ROOT, help="directory that contains data/")
+    parser.add_argument("--copies", type=int, default=4)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DIALOG_CACHE_DIR", tempfile.mkdtemp())
+    from batch_analysis import RECORD_PATH, analyze_records, local_record_file
+    from data_sources import LocalSource, list_data_files
+
+    with tempfile.TemporaryDirectory() as tmp:
+        total = build_tree(os.path.abspath(args.root), args.copies, tmp)
+        source = LocalSource(tmp)
+        entries = list_data_files(source.index(), RECORD_PATH)
+        # 先建立行索引，计时只包括解析
+        for entry in entries:
+            local_record_file(source, entry)
+
+        workers = 1
+        baseline = None
+        print(f"{len(entries)} files, {total / 1024 / 1024:.1f} MB, {os.cpu_count()} cores")
+        while workers <= args.max_workers:
+            start = time.perf_counter()
+            dialogs = analyze_records(source, entries, workers)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"{workers:>3} workers: {elapsed:6.2f} s  {total / 1024 / 1024 / elapsed:6.1f} MB/s  "
+                  f"speedup {baseline / elapsed:4.1f}x  ({len(dialogs)} dialogs)")
+            workers *= 2
+
+
+if __name__ == "__main__":
+    main()
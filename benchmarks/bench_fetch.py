@@ -0,0 +1,87 @@
+"""Wall time of sequential vs pooled fetching against a local stand-in server.
+
+The stand-in answers every request like the GitHub contents API (a JSON body
+with base64 content) after a fixed delay, so the numbers show how the
+eval-metrics page scales with the number of files.
+
+    python benchmarks/bench_fetch.py --counts 10 25 50 100 --latency 0.05
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import github_fetch  # noqa: E402
+
+SAMPLE = "Testing SR: 0.5\nTesting Avg@T: 6.0\nTesting Rewards: 0.1\n" * 4
+
+
+def make_handler(latency):
+    body = json.dumps({"content": base64.b64encode(SAMPLE.encode()).decode()}).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def run_sequential(urls):
+    for url in urls:
+        requests.get(url).json()
+
+
+def run_pooled(urls):
+    for response in github_fetch.fetch_many(urls):
+        response.json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--counts", type=int, nargs="+", default=[10, 25, 50, 100])
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="artificial per-request server latency in seconds")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.latency))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    root = f"http://127.0.0.1:{server.server_port}"
+
+    print(f"{'files':>6} {'sequential (s)':>15} {'pooled (s)':>11} {'speedup':>8}")
+    for count in args.counts:
+        urls = [github_fetch.contents_url("owner", "repo", f"data/eval_metrics/Evaluate-epoch-{i}.txt", api_root=root)
+                for i in range(count)]
+
+        start = time.perf_counter()
+        run_sequential(urls)
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        run_pooled(urls)
+        pooled = time.perf_counter() - start
+
+        print(f"{count:>6} {sequential:>15.3f} {pooled:>11.3f} {sequential / pooled:>7.1f}x")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
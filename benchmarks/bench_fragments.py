@@ -0,0 +1,76 @@
+"""Time to switch dialogs: a full rerun of the app vs a rerun of the dialog fragment only.
+
+Selecting another dialog reruns only show_dialog_picker and the transcript
+fragment inside it. AppTest always reruns a whole script, so the fragment
+rerun is measured with a script that calls just that fragment, over the
+same warm caches the app uses.
+
+    python benchmarks/bench_fragments.py [--root .] [--switches 10]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def fragment_script():
+    import streamlit as st
+
+    import view_dialog
+    from record_store import get_store
+
+    # 片段重跑时 Streamlit 只执行这个函数，参数来自上一次完整运行
+    view_dialog.show_dialog_picker(get_store(), st.session_state.bench_sha)
+
+
+def time_switches(at, switches):
+    dialogs = at.selectbox(key="dialog_selector").options
+    timings = []
+    for i in range(switches):
+        selectbox = at.selectbox(key="dialog_selector")
+        selectbox.select_index((selectbox.index + 1) % len(dialogs))
+        start = time.perf_counter()
+        at.run()
+        timings.append(time.perf_counter() - start)
+        if at.exception:
+            sys.exit(at.exception[0].value)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--root", default=ROOT, help="directory that contains data/")
+    parser.add_argument("--switches", type=int, default=10)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DIALOG_CACHE_DIR", tempfile.mkdtemp())
+    os.environ.update(DATA_SOURCE="local", DATA_DIR=os.path.abspath(args.root))
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(os.path.join(ROOT, "view_dialog.py"), default_timeout=300)
+    app.session_state.authenticated = True
+    app.run()
+    full = time_switches(app, args.switches)
+
+    from data_sources import source_from_config
+    from view_dialog import list_data_files
+    entries = list_data_files(source_from_config(os.environ).index(), "data/conversation_history")
+    sha = {entry['path']: entry['sha'] for entry in entries}[app.selectbox(key="file_selector").value]
+
+    fragment = AppTest.from_function(fragment_script, default_timeout=300)
+    fragment.session_state.bench_sha = sha
+    fragment.run()
+    partial = time_switches(fragment, args.switches)
+
+    for name, timings in (("full rerun", full), ("dialog fragment", partial)):
+        print(f"{name:>16}: median {statistics.median(timings) * 1000:7.1f} ms  "
+              f"max {max(timings) * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Parse time and peak memory of parse_record on record files, next to json.loads of the same data.
+
+The json.loads line is a reference: it is what parsing would cost if the
+records were stored as JSON instead of Python reprs.
+
+    python benchmarks/bench_parser.py [data/conversation_history_before_0211]
+"""
+import glob
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from record_parser import parse_record  # noqa: E402
+
+
+def load_lines(directory):
+    lines = []
+    for path in sorted(glob.glob(os.path.join(directory, "full_state_Record-*.txt"))):
+        # RecordFile 读出的是原始字节
+        with open(path, "rb") as f:
+            lines.extend(line for line in f if line.strip())
+    return lines
+
+
+def measure(parse, lines):
+    start = time.perf_counter()
+    for line in lines:
+        parse(line)
+    elapsed = time.perf_counter() - start
+
+    # 单独测量峰值内存，避免 tracemalloc 的开销影响计时
+    peak = 0
+    for line in lines:
+        tracemalloc.start()
+        parse(line)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    directory = sys.argv[1] if len(sys.argv) > 1 else os.path.join(ROOT, "data", "conversation_history_before_0211")
+    lines = load_lines(directory)
+    total_mb = sum(len(line) for line in lines) / 1024 / 1024
+
+    print(f"{len(lines)} records, {total_mb:.1f} MB")
+
+    elapsed, peak = measure(parse_record, lines)
+    print(f"{'parse_record':>17}: {elapsed:7.3f} s  {total_mb / elapsed:7.1f} MB/s  peak/record {peak / 1024:8.0f} KB")
+
+    # 参考：同样的数据若本身就是 JSON，json.loads 需要的时间
+    converted = [json.dumps(parse_record(line)) for line in lines]
+    elapsed, peak = measure(json.loads, converted)
+    print(f"{'json.loads (ref)':>17}: {elapsed:7.3f} s  {total_mb / elapsed:7.1f} MB/s  peak/record {peak / 1024:8.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Render time and delta count of format_dialog against dialog length.
+
+Each synthetic dialog has N turns (Recommender, Seeker, critic) with
+prompt-sized strings and is rendered through Streamlit's AppTest, once per
+rendering mode. "elements" counts every element and block the script sends
+to the browser.
+
+    python benchmarks/bench_render.py --turns 5 10 20 40 80
+"""
+import argparse
+import os
+import sys
+import time
+
+from streamlit.testing.v1 import AppTest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_dialog(turns, prompt_chars=6000):
+    prompt = ("You are a recommender chatting with the user. " * (prompt_chars // 46))[:prompt_chars]
+    messages = [{"role": "Seeker", "content": "Hi, I am looking for a movie to watch tonight."}]
+    for turn in range(turns):
+        messages.append({
+            "role": "Recommender",
+            "content": f"Turn {turn}: how about *Inception* (2010)? It is a mind-bending thriller.",
+            "user_preference": "Likes science fiction with clever plots.",
+            "Recommender_prompt": prompt,
+        })
+        messages.append({
+            "role": "Seeker",
+            "content": "Sounds interesting, but I have seen it already. Anything else?",
+            "Seeker_prompt": prompt,
+        })
+        messages.append({
+            "role": "critic",
+            "content": ["The recommendation matched the preference.", "The seeker rejected it."],
+            "critic_prompt": prompt,
+            "reward": 0.1 * (turn % 10),
+        })
+    return {"full_state": messages, "reward": 1.0}
+
+
+def render_script(root, dialog, batched):
+    import sys
+
+    sys.path.insert(0, root)
+    from view_dialog import format_dialog
+
+    format_dialog(dialog, batched=batched)
+
+
+def count_elements(node):
+    children = getattr(node, "children", {})
+    return 1 + sum(count_elements(child) for child in children.values())
+
+
+def measure(dialog, batched, repeat):
+    app = AppTest.from_function(render_script, args=(ROOT, dialog, batched), default_timeout=60)
+    app.run()
+    elements = count_elements(app._tree) - 1
+    start = time.perf_counter()
+    for _ in range(repeat):
+        app.run()
+    return (time.perf_counter() - start) / repeat, elements
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, nargs="+", default=[5, 10, 20, 40, 80])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'turns':>6} {'per-message (ms)':>17} {'elements':>9} {'single-block (ms)':>18} {'elements':>9}")
+    for turns in args.turns:
+        dialog = make_dialog(turns)
+        classic_time, classic_elements = measure(dialog, False, args.repeat)
+        batched_time, batched_elements = measure(dialog, True, args.repeat)
+        print(f"{turns:>6} {classic_time * 1000:>17.1f} {classic_elements:>9} "
+              f"{batched_time * 1000:>18.1f} {batched_elements:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Full-text search latency of the record store as the number of stored dialogs grows.
+
+The dialogs of the record files in a directory are ingested again and
+again under different SHAs until the store holds --dialogs dialogs, and
+a few queries are timed at every size.
+
+    python benchmarks/bench_search.py [data/conversation_history_before_0211] [--dialogs 20000]
+"""
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from record_parser import RecordFile  # noqa: E402
+from record_store import RecordStore  # noqa: E402
+
+QUERIES = ["comedy", "family friendly", "recommend*", "not yet made a recommendation", "zzzz"]
+
+
+def load_dialogs(directory):
+    dialogs = []
+    for path in sorted(glob.glob(os.path.join(directory, "full_state_Record-*.txt"))):
+        dialogs.extend(RecordFile(path))
+    return dialogs
+
+
+def time_queries(store, repeat=5):
+    results = {}
+    for query in QUERIES:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            hits = store.search(query, limit=50)
+        results[query] = ((time.perf_counter() - start) / repeat, len(hits))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", nargs="?", default=os.path.join(ROOT, "data", "conversation_history_before_0211"))
+    parser.add_argument("--dialogs", type=int, default=20000)
+    args = parser.parse_args()
+
+    dialogs = load_dialogs(args.directory)
+    if not dialogs:
+        sys.exit(f"No record files in {args.directory}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = RecordStore(os.path.join(tmp, "records.sqlite"))
+        stored = 0
+        copy = 0
+        checkpoint = len(dialogs)
+        print(f"{'dialogs':>8} {'ingest/s':>9} " + " ".join(f"{query[:14]:>16}" for query in QUERIES))
+        while stored < args.dialogs:
+            start = time.perf_counter()
+            stored += store.ingest(f"copy-{copy}", f"copy-{copy}.txt", dialogs)
+            rate = len(dialogs) / (time.perf_counter() - start)
+            copy += 1
+            if stored >= checkpoint or stored >= args.dialogs:
+                results = time_queries(store)
+                print(f"{stored:>8} {rate:>9.0f} " + " ".join(
+                    f"{results[query][0] * 1000:>8.2f} ms ({results[query][1]:>2})" for query in QUERIES
+                ))
+                checkpoint *= 4
+        print(f"store size: {os.path.getsize(store.path) / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
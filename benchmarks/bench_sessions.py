@@ -0,0 +1,96 @@
+"""Requests sent and work done when many sessions open the dashboard at once.
+
+Every simulated session lists the data, opens the newest record file
+and one of its dialogs, and loads the metrics of every eval file, using
+the same helpers as view_dialog.py, against the GitHub stand-in server.
+The run is repeated without the shared cache's coalescing for comparison.
+
+    python benchmarks/bench_sessions.py [--sessions 12] [--root .]
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+class Uncoalesced:
+    """Stand-in for SharedCache that runs every load, as each session did on its own before"""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def get_or_load(self, key, load, cache=True):
+        return load()
+
+    def coalesce(self, key, run):
+        return run()
+
+    def __getattr__(self, name):
+        return getattr(self.cache, name)
+
+
+def session(view_dialog, source, barrier):
+    barrier.wait()
+    index = view_dialog.get_data_index(source)
+    records = view_dialog.list_data_files(index, "data/conversation_history")
+    entry = records[-1]
+    if view_dialog.ingest_file(source, entry['path'], entry['sha']):
+        view_dialog.get_store().load_dialog(entry['sha'], 0, with_prompts=False, turns=(0, 10))
+    view_dialog.load_eval_metrics_for(source, view_dialog.list_data_files(index, "data/eval_metrics"))
+
+
+def run(sessions, root, coalesce):
+    # 每轮使用新的缓存目录与 store，模拟训练刚结束、所有文件都是新的
+    cache_dir = tempfile.mkdtemp()
+    os.environ["DIALOG_CACHE_DIR"] = cache_dir
+    os.environ["DIALOG_STORE_PATH"] = os.path.join(cache_dir, "records.sqlite")
+    for name in list(sys.modules):
+        if name in ("content_cache", "record_store", "shared_cache", "eval_metrics", "data_sources",
+                    "github_fetch", "view_dialog", "run_index", "live_tail", "charts"):
+            del sys.modules[name]
+
+    import github_standin
+    import shared_cache
+    server, api_root = github_standin.start(root)
+    import view_dialog
+    # 脱离 streamlit run 调用 st.* 时的提示
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").setLevel(logging.ERROR)
+    if not coalesce:
+        shared_cache._shared = Uncoalesced(shared_cache.SharedCache())
+    source = view_dialog.source_from_config({"GITHUB_API_ROOT": api_root})
+
+    barrier = threading.Barrier(sessions)
+    threads = [threading.Thread(target=session, args=(view_dialog, source, barrier)) for _ in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    requests = server.RequestHandlerClass.stats["requests"]
+    server.shutdown()
+    return elapsed, requests, shared_cache.get_shared_cache().stats()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=12)
+    parser.add_argument("--root", default=ROOT, help="directory that contains data/")
+    args = parser.parse_args()
+
+    for coalesce in (False, True):
+        elapsed, requests, stats = run(args.sessions, args.root, coalesce)
+        print(f"{'coalesced' if coalesce else 'per session':>12}: {elapsed:6.2f} s  "
+              f"{requests:4d} HTTP requests  loads {stats['loads']:4d}  "
+              f"coalesced {stats['coalesced']:4d}  hits {stats['hits']:4d}")
+
+
+if __name__ == "__main__":
+    main()
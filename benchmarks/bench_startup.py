@@ -0,0 +1,91 @@
+"""Cold-start cost of the app: import time and time to the first rendered login page.
+
+Every sample runs in a fresh interpreter, as a new server process would.
+The import of view_dialog is timed separately from Streamlit's own, and
+the heavy modules it pulls in beyond Streamlit are listed. With --check
+the benchmark exits with an error when view_dialog imports one of
+HEAVY_MODULES at startup or its import takes longer than --max-import-ms,
+so it can guard against regressions in CI.
+
+    python benchmarks/bench_startup.py [--runs 5] [--check] [--max-import-ms 60]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 只有指标分析页与 GitHub 数据源需要的模块，启动时不应被 view_dialog 导入
+HEAVY_MODULES = ("numpy", "plotly.graph_objects", "requests", "pandas", "pyarrow")
+
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import streamlit
+streamlit_done = time.perf_counter()
+before = set(sys.modules)
+import view_dialog
+done = time.perf_counter()
+print(json.dumps({
+    "streamlit": streamlit_done - start,
+    "view_dialog": done - streamlit_done,
+    "loaded": sorted(name for name in %r if name in sys.modules and name not in before),
+}))
+"""
+
+LOGIN_SCRIPT = """
+import json, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file("view_dialog.py", default_timeout=120)
+ready = time.perf_counter()
+app.run()
+done = time.perf_counter()
+assert not app.exception, app.exception
+assert app.text_input(key="password_input"), "login page not rendered"
+print(json.dumps({"total": done - start, "run": done - ready}))
+"""
+
+
+def sample(script, env):
+    output = subprocess.run(
+        [sys.executable, "-c", script], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--check", action="store_true", help="fail on heavy imports or a slow view_dialog import")
+    parser.add_argument("--max-import-ms", type=float, default=60)
+    args = parser.parse_args()
+
+    env = dict(os.environ, DIALOG_CACHE_DIR=tempfile.mkdtemp(), PYTHONDONTWRITEBYTECODE="1")
+    imports = [sample(IMPORT_SCRIPT % (HEAVY_MODULES,), env) for _ in range(args.runs)]
+    logins = [sample(LOGIN_SCRIPT, env) for _ in range(args.runs)]
+
+    def report(name, values):
+        print(f"{name:>26}: median {statistics.median(values) * 1000:7.1f} ms  max {max(values) * 1000:7.1f} ms")
+
+    report("import streamlit", [result["streamlit"] for result in imports])
+    report("import view_dialog", [result["view_dialog"] for result in imports])
+    report("first login page (total)", [result["total"] for result in logins])
+    report("first login page (run)", [result["run"] for result in logins])
+    loaded = sorted({name for result in imports for name in result["loaded"]})
+    print(f"heavy modules imported by view_dialog: {', '.join(loaded) or 'none'}")
+
+    if args.check:
+        import_ms = statistics.median(result["view_dialog"] for result in imports) * 1000
+        if loaded:
+            sys.exit(f"view_dialog imports {', '.join(loaded)} at startup")
+        if import_ms > args.max_import_ms:
+            sys.exit(f"view_dialog import took {import_ms:.1f} ms (limit {args.max_import_ms:g} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Local stand-in for the parts of the GitHub API the visualizer uses.
+
+Serves a directory (by default the repository root, which contains data/)
+through the contents, git trees and raw download endpoints, with ETags,
+Range requests and X-RateLimit headers, so the GitHub data source can be
+exercised without network access or a token:
+
+    python benchmarks/github_standin.py --root . --port 8765
+    GITHUB_API_ROOT=http://127.0.0.1:8765 streamlit run view_dialog.py
+
+start() runs the same server in a background thread for scripts and tests.
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RATE_LIMIT = 5000
+
+
+def blob_sha(data):
+    """Git blob SHA of the bytes, as GitHub reports it"""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def make_handler(root):
+    stats = {"requests": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def send(self, status, body, content_type="application/json", headers=()):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("X-RateLimit-Limit", str(RATE_LIMIT))
+            self.send_header("X-RateLimit-Remaining", str(max(RATE_LIMIT - stats["requests"], 0)))
+            self.send_header("X-RateLimit-Reset", str(int(time.time()) + 3600))
+            for key, value in headers:
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def send_json(self, value):
+            body = json.dumps(value).encode()
+            etag = '"%s"' % hashlib.md5(body).hexdigest()
+            if self.headers.get("If-None-Match") == etag:
+                return self.send(304, b"", headers=[("ETag", etag)])
+            return self.send(200, body, headers=[("ETag", etag)])
+
+        def local_path(self, relative):
+            path = os.path.normpath(os.path.join(root, relative))
+            return path if os.path.commonpath([path, root]) == root else None
+
+        def do_GET(self):
+            stats["requests"] += 1
+            url_path = urllib.parse.urlsplit(self.path).path
+            parts = url_path.split("/")
+            base = f"http://{self.headers['Host']}"
+
+            # /raw/<path>：下载地址，支持 Range
+            if url_path.startswith("/raw/"):
+                path = self.local_path(urllib.parse.unquote(url_path[len("/raw/"):]))
+                if path is None or not os.path.isfile(path):
+                    return self.send(404, b"{}")
+                with open(path, "rb") as f:
+                    data = f.read()
+                byte_range = self.headers.get("Range")
+                if byte_range:
+                    start, end = byte_range.split("=", 1)[1].split("-")
+                    start, end = int(start), int(end) if end else len(data) - 1
+                    return self.send(206, data[start:end + 1], "text/plain",
+                                     [("Content-Range", f"bytes {start}-{end}/{len(data)}")])
+                return self.send(200, data, "text/plain")
+
+            # /repos/<owner>/<repo>/contents/<path>
+            if len(parts) > 5 and parts[4] == "contents":
+                relative = urllib.parse.unquote("/".join(parts[5:]))
+                path = self.local_path(relative)
+                if path is not None and os.path.isdir(path):
+                    listing = []
+                    for name in sorted(os.listdir(path)):
+                        child = os.path.join(path, name)
+                        entry = {"name": name, "path": f"{relative}/{name}"}
+                        if os.path.isfile(child):
+                            with open(child, "rb") as f:
+                                data = f.read()
+                            entry.update(type="file", sha=blob_sha(data), size=len(data),
+                                         download_url=f"{base}/raw/{urllib.parse.quote(entry['path'])}")
+                        else:
+                            entry.update(type="dir", sha="", size=0)
+                        listing.append(entry)
+                    return self.send_json(listing)
+                if path is not None and os.path.isfile(path):
+                    with open(path, "rb") as f:
+                        data = f.read()
+                    return self.send_json({
+                        "name": os.path.basename(relative), "path": relative, "type": "file",
+                        "sha": blob_sha(data), "size": len(data),
+                        # 与 GitHub 一致：超过 1 MB 的文件不内联内容
+                        "content": base64.b64encode(data).decode() if len(data) < 1024 * 1024 else "",
+                        "download_url": f"{base}/raw/{urllib.parse.quote(relative)}",
+                    })
+                return self.send(404, b"{}")
+
+            # /repos/<owner>/<repo>/git/trees/<ref>?recursive=1
+            if len(parts) > 6 and parts[4] == "git" and parts[5] == "trees":
+                tree = []
+                for directory, directories, names in os.walk(root):
+                    directories[:] = [name for name in directories if not name.startswith(".")]
+                    for name in directories:
+                        relative = os.path.relpath(os.path.join(directory, name), root).replace(os.sep, "/")
+                        tree.append({"path": relative, "type": "tree", "mode": "040000", "sha": ""})
+                    for name in names:
+                        path = os.path.join(directory, name)
+                        with open(path, "rb") as f:
+                            data = f.read()
+                        relative = os.path.relpath(path, root).replace(os.sep, "/")
+                        tree.append({"path": relative, "type": "blob", "mode": "100644",
+                                     "sha": blob_sha(data), "size": len(data)})
+                tree_sha = hashlib.sha1(json.dumps(tree, sort_keys=True).encode()).hexdigest()
+                return self.send_json({"sha": tree_sha, "tree": tree, "truncated": False})
+
+            return self.send(404, b"{}")
+
+    Handler.stats = stats
+    return Handler
+
+
+def start(root=ROOT, port=0):
+    """Serve root in a background thread; returns (server, api_root)"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(os.path.abspath(root)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--root", default=ROOT, help="directory that contains data/")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(os.path.abspath(args.root)))
+    print(f"Serving {os.path.abspath(args.root)} as the GitHub API on http://127.0.0.1:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+import perf_trace
+from eval_metrics import OVERALL_METRICS
+
+# 多条曲线叠加时使用的颜色，第一条保持原来的紫色
+SERIES_COLORS = ['#6c5ce7', '#00b894', '#e17055', '#0984e3', '#fdcb6e', '#d63031', '#636e72', '#e84393']
+# 缓存的是 go.Figure 对象而非序列化后的 JSON；未变的图表是否重发取决于 .streamlit/config.toml 的 minCachedMessageSize
+MAX_CACHED_FIGURES = 32
+
+_figures = OrderedDict()
+_figures_lock = threading.Lock()
+
+
+def _table_hash(kind, table):
+    digest = hashlib.sha1(kind.encode())
+    for label, matrix in table.items():
+        digest.update(label.encode())
+        for array in (matrix.epochs, matrix.overall, matrix.turns):
+            digest.update(str(array.shape).encode())
+            digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+
+def cached_figure(kind, table, build):
+    """Build a figure once per (kind, data); identical data returns the same figure object.
+
+    Only construction is memoized: st.plotly_chart still serializes the
+    figure on every rerun.
+    """
+    key = _table_hash(kind, table)
+    with _figures_lock:
+        fig = _figures.get(key)
+        if fig is not None:
+            _figures.move_to_end(key)
+            return fig
+    with perf_trace.stage("build figures"):
+        fig = build(table)
+    with _figures_lock:
+        _figures[key] = fig
+        while len(_figures) > MAX_CACHED_FIGURES:
+            _figures.popitem(last=False)
+    return fig
+
+
+def _valid(x, y):
+    mask = ~np.isnan(y)
+    return x[mask], y[mask]
+
+
+def _turn_column(matrix, turn):
+    if turn < matrix.turns.shape[1]:
+        return matrix.turns[:, turn]
+    return np.full(len(matrix), np.nan)
+
+
+def turn_count(table):
+    """Number of SR-turn@k columns of the widest run; 0 when no eval file has any"""
+    return max(matrix.turns.shape[1] for matrix in table.values())
+
+
+def overall_grid(table):
+    """SR, Avg@T and Rewards side by side in one figure, one trace per run"""
+    fig = make_subplots(rows=1, cols=len(OVERALL_METRICS), subplot_titles=OVERALL_METRICS)
+    for k, (label, matrix) in enumerate(table.items()):
+        color = SERIES_COLORS[k % len(SERIES_COLORS)]
+        for col, metric_name in enumerate(OVERALL_METRICS, 1):
+            x, y = _valid(matrix.epochs, matrix.metric(metric_name))
+            fig.add_trace(go.Scatter(
+                x=x, y=y, mode='lines+markers', name=label, legendgroup=label,
+                showlegend=col == 1 and len(table) > 1,
+                line=dict(color=color, width=2), marker=dict(size=6)
+            ), row=1, col=col)
+    for col in range(1, len(OVERALL_METRICS) + 1):
+        fig.update_xaxes(title_text="Epoch", row=1, col=col)
+    fig.update_layout(height=340, margin=dict(l=40, r=40, t=60, b=40))
+    return fig
+
+
+def turn_curves(table):
+    """All SR-turn@k curves in one figure.
+
+    With a single run every turn is one trace on shared axes; with several
+    runs each turn gets its own panel in a grid, with one trace per run.
+    """
+    turns = turn_count(table)
+    if len(table) == 1:
+        matrix = next(iter(table.values()))
+        fig = go.Figure()
+        for turn in range(turns):
+            x, y = _valid(matrix.epochs, _turn_column(matrix, turn))
+            # 回合越靠后颜色越深
+            shade = 0.25 + 0.75 * turn / max(turns - 1, 1)
+            fig.add_trace(go.Scatter(
+                x=x, y=y, mode='lines+markers', name=f'Turn {turn}',
+                line=dict(color=f'rgba(108, 92, 231, {shade:.2f})', width=2), marker=dict(size=6)
+            ))
+        fig.update_layout(xaxis_title="Epoch", yaxis_title="Success Rate",
+                          height=420, margin=dict(l=40, r=40, t=40, b=40))
+        return fig
+
+    cols = 5
+    rows = (turns + cols - 1) // cols
+    fig = make_subplots(rows=rows, cols=cols, shared_yaxes=True,
+                        subplot_titles=[f'Turn {turn}' for turn in range(turns)])
+    for k, (label, matrix) in enumerate(table.items()):
+        color = SERIES_COLORS[k % len(SERIES_COLORS)]
+        for turn in range(turns):
+            x, y = _valid(matrix.epochs, _turn_column(matrix, turn))
+            fig.add_trace(go.Scatter(
+                x=x, y=y, mode='lines+markers', name=label, legendgroup=label,
+                showlegend=turn == 0, line=dict(color=color, width=2), marker=dict(size=4)
+            ), row=turn // cols + 1, col=turn % cols + 1)
+    fig.update_layout(height=260 * rows, margin=dict(l=40, r=40, t=60, b=40))
+    return fig
+
+
+def turn_heatmap(table):
+    """Epoch × turn heatmap of SR-turn@k, one row of panels per run"""
+    turns = turn_count(table)
+    # make_subplots 要求 vertical_spacing 不超过 1/(rows-1)，run 多时按行数缩小间距
+    spacing = min(0.12, 1 / max(len(table) - 1, 1) * 0.9) if len(table) > 1 else 0.02
+    fig = make_subplots(rows=len(table), cols=1, subplot_titles=list(table) if len(table) > 1 else None,
+                        vertical_spacing=spacing)
+    for row, matrix in enumerate(table.values(), 1):
+        z = np.stack([_turn_column(matrix, turn) for turn in range(turns)])
+        fig.add_trace(go.Heatmap(
+            x=matrix.epochs, y=[f'Turn {turn}' for turn in range(turns)], z=z,
+            coloraxis="coloraxis", hovertemplate="Epoch %{x}<br>%{y}: %{z:.3f}<extra></extra>"
+        ), row=row, col=1)
+        fig.update_xaxes(title_text="Epoch", type='category', row=row, col=1)
+    fig.update_layout(coloraxis=dict(colorscale='Purples', colorbar=dict(title="SR")),
+                      height=60 + 320 * len(table), margin=dict(l=40, r=40, t=60, b=40))
+    return fig
@@ -0,0 +1,143 @@
+import contextlib
+import json
+import os
+import tempfile
+import threading
+
+CACHE_DIR = os.environ.get(
+    "DIALOG_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "dialog-visualizer")
+)
+MAX_BYTES = int(os.environ.get("DIALOG_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+
+class BlobCache:
+    """On-disk file cache keyed by Git blob SHA with LRU eviction.
+
+    Each blob is stored as one file named after its SHA; the file mtime doubles
+    as the last-access time used for eviction.
+    """
+
+    def __init__(self, root=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.blob_dir = os.path.join(root, "blobs")
+        self.meta_dir = os.path.join(root, "meta")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.meta_dir, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._total_bytes = sum(
+            entry.stat().st_size for entry in os.scandir(self.blob_dir) if entry.is_file()
+        )
+
+    def blob_path(self, sha):
+        return os.path.join(self.blob_dir, sha)
+
+    def get_path(self, sha):
+        """Return the local path of a cached blob, or None on a miss"""
+        path = self.blob_path(sha)
+        with self._lock:
+            try:
+                # 更新访问时间，用于 LRU
+                os.utime(path)
+            except FileNotFoundError:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return path
+
+    def get(self, sha):
+        path = self.get_path(sha)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            # 读取前被其它线程淘汰
+            return None
+
+    def put(self, sha, data):
+        """Store a blob and return its path"""
+        with self.writer(sha) as f:
+            f.write(data)
+        return self.blob_path(sha)
+
+    @contextlib.contextmanager
+    def writer(self, sha):
+        """Stream a blob into the cache; it becomes visible only once complete"""
+        path = self.blob_path(sha)
+        fd, tmp_path = tempfile.mkstemp(dir=self.blob_dir, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                yield f
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        size = os.path.getsize(tmp_path)
+        with self._lock:
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            self._total_bytes += size - old_size
+            self._evict(keep=sha)
+
+    def get_meta(self, sha, kind):
+        """Load a small JSON sidecar derived from a blob (e.g. its line index)"""
+        try:
+            with open(os.path.join(self.meta_dir, f"{sha}.{kind}.json"), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def put_meta(self, sha, kind, value):
+        """Store a sidecar; it is keyed by SHA so it never outlives its content"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.meta_dir, prefix=".tmp-")
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(value, f)
+        os.replace(tmp_path, os.path.join(self.meta_dir, f"{sha}.{kind}.json"))
+
+    def _evict(self, keep=None):
+        if self._total_bytes <= self.max_bytes:
+            return
+        entries = [
+            entry for entry in os.scandir(self.blob_dir)
+            if entry.is_file() and not entry.name.startswith(".tmp-") and entry.name != keep
+        ]
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries:
+            if self._total_bytes <= self.max_bytes:
+                break
+            size = entry.stat().st_size
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+            self._total_bytes -= size
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Return the process-wide blob cache"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = BlobCache()
+    return _cache
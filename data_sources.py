@@ -0,0 +1,262 @@
+import base64
+import hashlib
+import os
+
+import perf_trace
+from content_cache import get_cache
+from github_fetch import (
+    fetch, fetch_many, fetch_range, get_tree_index, github_headers, contents_url
+)
+from record_parser import RecordFile, build_line_index
+
+DEFAULT_REPO = "ym689/dialog-visualizer"
+DATA_PREFIX = "data"
+
+
+class DataSourceError(Exception):
+    """A data source could not list or read a file; the message is shown to the user"""
+
+
+class GitHubSource:
+    """Reads the data/ tree of a GitHub repository through the REST API.
+
+    File contents are kept in the blob cache keyed by Git blob SHA, so
+    unchanged files are read from disk; api_root points the source at a
+    GitHub-compatible server such as benchmarks/github_standin.py.
+    """
+
+    kind = "github"
+
+    def __init__(self, repo=DEFAULT_REPO, token=None, api_root=None):
+        self.owner, self.name = repo.split('/', 1)
+        self.headers = github_headers(token)
+        self.api_root = api_root
+
+    def describe(self):
+        return f"GitHub {self.owner}/{self.name}"
+
+    def _url(self, path):
+        return contents_url(self.owner, self.name, path, api_root=self.api_root)
+
+    def index(self, ttl=None):
+        """Map every data directory (archives included) to its files via one Git Trees call.
+
+        ttl overrides how long a listing is reused before it is revalidated.
+        """
+        status_code, index = get_tree_index(
+            self.owner, self.name, headers=self.headers, prefix=f"{DATA_PREFIX}/",
+            api_root=self.api_root, ttl=ttl
+        )
+        if index is None:
+            raise DataSourceError(f"GitHub API Error: {status_code}")
+        return index
+
+    def file_info(self, path):
+        """Fetch a file's contents-API metadata (sha, download_url)"""
+        response = fetch(self._url(path), headers=self.headers)
+        if response.status_code != 200:
+            raise DataSourceError(f"Error fetching file: {response.status_code}")
+        file_info = response.json()
+        if not file_info.get('download_url'):
+            raise DataSourceError("No download URL found")
+        return file_info
+
+    def download(self, path):
+        """Stream a file from its download_url into the blob cache; returns (sha, local path)"""
+        file_info = self.file_info(path)
+        # 分块下载文件内容，直接写入缓存，不在内存中保留整个文件
+        cache = get_cache()
+        with perf_trace.stage("download"), \
+                fetch(file_info['download_url'], headers=self.headers, stream=True) as file_response:
+            if file_response.status_code != 200:
+                raise DataSourceError(f"File download failed: {file_response.status_code}")
+            with cache.writer(file_info['sha']) as f:
+                for chunk in file_response.iter_content(chunk_size=64 * 1024):
+                    f.write(chunk)
+                    perf_trace.add_bytes(len(chunk))
+        return file_info['sha'], cache.blob_path(file_info['sha'])
+
+    def read_bytes(self, path, sha=None):
+        """Read a small file, serving unchanged files from the blob cache"""
+        content = get_cache().get(sha) if sha else None
+        if content is not None:
+            # 命中缓存：跳过 JSON 与 base64 解码
+            return content
+
+        with perf_trace.stage("fetch"):
+            response = fetch(self._url(path), headers=self.headers)
+            perf_trace.add_bytes(len(response.content))
+            if response.status_code != 200:
+                raise DataSourceError(f"Error fetching file: {response.status_code}")
+            file_info = response.json()
+        with perf_trace.stage("base64 decode"):
+            content = base64.b64decode(file_info['content'])
+        get_cache().put(file_info['sha'], content)
+        return content
+
+    def read_many(self, entries):
+        """Read many small files concurrently; returns ({path: bytes}, {path: error message})"""
+        cache = get_cache()
+        contents = {entry['path']: cache.get(entry['sha']) for entry in entries}
+        errors = {}
+
+        # 并发读取其余文件数据（共享连接池）
+        missing = [path for path, content in contents.items() if content is None]
+        with perf_trace.stage("fetch"):
+            responses = fetch_many([self._url(path) for path in missing], headers=self.headers)
+            perf_trace.add_bytes(sum(len(r.content) for r in responses if not isinstance(r, Exception)))
+        for path, response in zip(missing, responses):
+            del contents[path]
+            if isinstance(response, Exception):
+                errors[path] = str(response)
+                continue
+            if response.status_code != 200:
+                continue
+            try:
+                file_info = response.json()
+                with perf_trace.stage("base64 decode"):
+                    contents[path] = base64.b64decode(file_info['content'])
+                cache.put(file_info['sha'], contents[path])
+            except Exception as e:
+                errors[path] = str(e)
+        return contents, errors
+
+    def range_reader(self, path):
+        """Return read(offset, length) over a file's bytes via HTTP Range requests"""
+        download_url = self.file_info(path)['download_url']
+        headers = self.headers
+        return lambda offset, length: fetch_range(download_url, offset, length, headers)
+
+    def record_file(self, path, sha=None):
+        """Return a RecordFile for a full_state_Record file, located through its cached line index"""
+        cache = get_cache()
+        local_path = cache.get_path(sha) if sha else None
+        offsets = cache.get_meta(sha, 'lines') if sha else None
+
+        if local_path is None and offsets is not None:
+            # 文件已被淘汰但索引仍在：用 Range 请求只读取选中的对话
+            return RecordFile(sha=sha, offsets=offsets, read_range=self.range_reader(path))
+
+        if local_path is None:
+            sha, local_path = self.download(path)
+
+        # 索引按 SHA 存储，文件内容变化后自动失效
+        if offsets is None:
+            offsets = build_line_index(local_path)
+            cache.put_meta(sha, 'lines', offsets)
+        return RecordFile(local_path, sha=sha, offsets=offsets)
+
+
+class LocalSource:
+    """Reads the data/ tree of a local or mounted directory.
+
+    Record files are memory-mapped, so selecting a dialog maps its bytes
+    straight from the page cache. A file's "sha" is a fingerprint of its
+    path, size and mtime: it changes whenever the file is rewritten or
+    appended to, which keeps the blob-cache sidecars and the record store
+    consistent without hashing the file contents.
+    """
+
+    kind = "local"
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def describe(self):
+        return f"Local {self.root}"
+
+    def _full_path(self, path):
+        full_path = os.path.normpath(os.path.join(self.root, path))
+        if os.path.commonpath([full_path, self.root]) != self.root:
+            raise DataSourceError(f"Path outside the data directory: {path}")
+        return full_path
+
+    def fingerprint(self, path, stat):
+        return hashlib.sha1(f"{path}\0{stat.st_size}\0{stat.st_mtime_ns}".encode()).hexdigest()
+
+    def index(self, ttl=None):
+        top = os.path.join(self.root, DATA_PREFIX)
+        if not os.path.isdir(top):
+            raise DataSourceError(f"Data directory not found: {top}")
+        index = {}
+        for directory, _, names in os.walk(top):
+            relative_dir = os.path.relpath(directory, self.root).replace(os.sep, '/')
+            for name in sorted(names):
+                if not name.endswith('.txt'):
+                    continue
+                path = f"{relative_dir}/{name}"
+                stat = os.stat(os.path.join(directory, name))
+                index.setdefault(relative_dir, []).append(
+                    {'name': name, 'path': path, 'sha': self.fingerprint(path, stat), 'size': stat.st_size}
+                )
+        return index
+
+    def read_bytes(self, path, sha=None):
+        try:
+            with perf_trace.stage("read"), open(self._full_path(path), 'rb') as f:
+                content = f.read()
+                perf_trace.add_bytes(len(content))
+            return content
+        except OSError as e:
+            raise DataSourceError(f"Error reading file: {e}") from e
+
+    def read_many(self, entries):
+        contents = {}
+        errors = {}
+        for entry in entries:
+            try:
+                contents[entry['path']] = self.read_bytes(entry['path'])
+            except DataSourceError as e:
+                errors[entry['path']] = str(e)
+        return contents, errors
+
+    def range_reader(self, path):
+        full_path = self._full_path(path)
+
+        def read(offset, length):
+            with open(full_path, 'rb') as f:
+                f.seek(offset)
+                data = f.read(length)
+            perf_trace.add_bytes(len(data))
+            return data
+        return read
+
+    def record_file(self, path, sha=None):
+        full_path = self._full_path(path)
+        if not os.path.isfile(full_path):
+            raise DataSourceError(f"File not found: {path}")
+        cache = get_cache()
+        offsets = cache.get_meta(sha, 'lines') if sha else None
+        if offsets is None:
+            offsets = build_line_index(full_path)
+            if sha:
+                cache.put_meta(sha, 'lines', offsets)
+        return RecordFile(full_path, sha=sha, offsets=offsets, mapped=True)
+
+
+def list_data_files(data_index, data_path):
+    """All files of data_path and its archive directories such as data_path + '_before_0211'"""
+    return [
+        entry
+        for directory in sorted(data_index)
+        if directory == data_path or directory.startswith(f"{data_path}_")
+        for entry in data_index[directory]
+    ]
+
+
+def source_from_config(config):
+    """Build the data source selected by a config mapping (Streamlit secrets or environment).
+
+    DATA_SOURCE is "github" (default) or "local"; the local source reads
+    DATA_DIR, the GitHub source GITHUB_REPO, GITHUB_TOKEN and GITHUB_API_ROOT.
+    """
+    kind = config.get("DATA_SOURCE", "github")
+    if kind == "local":
+        return LocalSource(config.get("DATA_DIR", "."))
+    if kind == "github":
+        return GitHubSource(
+            repo=config.get("GITHUB_REPO", DEFAULT_REPO),
+            token=config.get("GITHUB_TOKEN"),
+            api_root=config.get("GITHUB_API_ROOT"),
+        )
+    raise DataSourceError(f"Unknown DATA_SOURCE: {kind}")
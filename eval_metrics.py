@@ -0,0 +1,74 @@
+import re
+from collections import namedtuple
+
+import perf_trace
+from content_cache import get_cache
+from shared_cache import get_shared_cache
+
+# 一个 Evaluate-epoch-*.txt 文件的解析结果；缺失的指标为 None
+EvalMetrics = namedtuple('EvalMetrics', ['sr', 'avg_turns', 'rewards', 'sr_turns', 'summary'])
+
+_METRIC_LINE = re.compile(r"^Testing (SR|Avg@T|Rewards|SR-turn@(\d+)):\s*(\S+)", re.MULTILINE)
+_SUMMARY_ROW = re.compile(r"^[^\S\n]*\S+(?:\t\S+)+[^\S\n]*$", re.MULTILINE)
+_FIELDS = {'SR': 'sr', 'Avg@T': 'avg_turns', 'Rewards': 'rewards'}
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def parse_eval_metrics(text):
+    """Parse the SR, Avg@T, Rewards, SR-turn@k lines and the trailing summary row of an eval file"""
+    values = {'sr': None, 'avg_turns': None, 'rewards': None}
+    turns = {}
+    for match in _METRIC_LINE.finditer(text):
+        name, turn, value = match.groups()
+        if turn is not None:
+            turns[int(turn)] = _to_float(value)
+        else:
+            values[_FIELDS[name]] = _to_float(value)
+
+    sr_turns = tuple(turns.get(turn) for turn in range(max(turns) + 1)) if turns else ()
+    rows = _SUMMARY_ROW.findall(text)
+    summary = tuple(_to_float(value) for value in rows[-1].split()) if rows else ()
+    return EvalMetrics(sr_turns=sr_turns, summary=summary, **values)
+
+
+def _stored_eval_metrics(sha):
+    stored = get_cache().get_meta(sha, 'metrics')
+    if stored is None:
+        return None
+    return EvalMetrics(**{
+        key: tuple(value) if isinstance(value, list) else value for key, value in stored.items()
+    })
+
+
+def cached_eval_metrics(sha):
+    """Return the parsed metrics of a file SHA without touching its content, or None"""
+    # 先查进程内共享缓存，再查磁盘缓存
+    shared = get_shared_cache()
+    metrics = shared.get(('metrics', sha))
+    if metrics is None:
+        metrics = _stored_eval_metrics(sha)
+        if metrics is not None:
+            shared.put(('metrics', sha), metrics)
+    return metrics
+
+
+def load_eval_metrics(sha, text):
+    """Parse an eval file once per SHA; later calls return the memoized record"""
+    def parse():
+        metrics = _stored_eval_metrics(sha)
+        if metrics is None:
+            with perf_trace.stage("parse metrics"):
+                metrics = parse_eval_metrics(text.decode('utf-8') if isinstance(text, bytes) else text)
+            # 同时写入磁盘缓存，重启后也无需重新解析
+            get_cache().put_meta(sha, 'metrics', metrics._asdict())
+        return metrics
+    return get_shared_cache().get_or_load(('metrics', sha), parse)
+
+
+OVERALL_METRICS = ('Success Rate', 'Average Turns', 'Rewards')
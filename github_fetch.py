@@ -0,0 +1,232 @@
+import os
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+import perf_trace
+
+# 可指向本地的 GitHub 替身服务（见 benchmarks/github_standin.py）
+API_ROOT = os.environ.get("GITHUB_API_ROOT", "https://api.github.com")
+
+# 同时进行的请求数上限，同时也是连接池大小
+MAX_WORKERS = 8
+
+# 目录列表在该时间（秒）内直接使用内存副本，不发请求
+LISTING_TTL = float(os.environ.get("GITHUB_LISTING_TTL", 60))
+
+_session = None
+_session_lock = threading.Lock()
+
+# url -> {'etag': ..., 'data': ..., 'checked_at': ...}
+_conditional_cache = {}
+_conditional_lock = threading.Lock()
+
+# 最近一次响应中的 X-RateLimit-* 信息
+rate_limit = {}
+listing_stats = {'network': 0, 'not_modified': 0, 'fresh': 0}
+# fetch_many 的工作线程与各会话同时更新计数
+_stats_lock = threading.Lock()
+
+
+def get_session():
+    """Return the process-wide keep-alive session shared by all GitHub reads"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            # 第一次请求时才导入 requests：本地数据源与登录页都用不到它
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+    return _session
+
+
+def count_listing(kind):
+    with _stats_lock:
+        listing_stats[kind] += 1
+
+
+def get_listing_stats():
+    """A consistent copy of the listing counters"""
+    with _stats_lock:
+        return dict(listing_stats)
+
+
+def github_headers(token):
+    headers = {"Accept": "application/vnd.github.v3+json"}
+    if token:
+        headers["Authorization"] = f"token {token}"
+    return headers
+
+
+def contents_url(repo_owner, repo_name, path, api_root=None):
+    # 对路径的每一段分别编码（文件名中含有 '#'）
+    encoded_path = '/'.join(urllib.parse.quote(part, safe='') for part in path.split('/'))
+    return f"{api_root or API_ROOT}/repos/{repo_owner}/{repo_name}/contents/{encoded_path}"
+
+
+def record_rate_limit(response):
+    headers = response.headers
+    if 'X-RateLimit-Remaining' not in headers:
+        return
+    with _stats_lock:
+        for key in ('Limit', 'Remaining', 'Used', 'Reset'):
+            value = headers.get(f'X-RateLimit-{key}')
+            if value is not None:
+                rate_limit[key.lower()] = int(value)
+        rate_limit['resource'] = headers.get('X-RateLimit-Resource', 'core')
+        rate_limit['updated_at'] = time.time()
+
+
+def fetch(url, headers=None, **kwargs):
+    response = get_session().get(url, headers=headers, **kwargs)
+    record_rate_limit(response)
+    return response
+
+
+def fetch_json_conditional(url, headers=None, ttl=None):
+    """GET a JSON document, revalidating the stored copy with If-None-Match.
+
+    Returns (status_code, data). Within ttl seconds of the last check the
+    stored copy is returned without touching the network; afterwards a 304
+    reply is served from memory and does not count against the rate limit.
+    data is None when the request failed.
+    """
+    ttl = LISTING_TTL if ttl is None else ttl
+    with _conditional_lock:
+        cached = _conditional_cache.get(url)
+    
+    if cached and time.time() - cached['checked_at'] < ttl:
+        count_listing('fresh')
+        return 200, cached['data']
+    
+    request_headers = dict(headers or {})
+    if cached and cached['etag']:
+        request_headers['If-None-Match'] = cached['etag']
+    
+    response = fetch(url, headers=request_headers)
+    if response.status_code == 304 and cached:
+        count_listing('not_modified')
+        with _conditional_lock:
+            cached['checked_at'] = time.time()
+        return 200, cached['data']
+    
+    count_listing('network')
+    perf_trace.add_bytes(len(response.content))
+    if response.status_code != 200:
+        return response.status_code, None
+    
+    data = response.json()
+    with _conditional_lock:
+        _conditional_cache[url] = {
+            'etag': response.headers.get('ETag'),
+            'data': data,
+            'checked_at': time.time(),
+        }
+    return 200, data
+
+
+def fetch_range(url, offset, length, headers=None):
+    """Fetch length bytes starting at offset with an HTTP Range request"""
+    range_headers = dict(headers or {})
+    range_headers['Range'] = f"bytes={offset}-{offset + length - 1}"
+    response = fetch(url, headers=range_headers)
+    response.raise_for_status()
+    perf_trace.add_bytes(len(response.content))
+    if response.status_code == 206:
+        return response.content
+    # 服务器忽略了 Range 头，返回了整个文件
+    return response.content[offset:offset + length]
+
+
+def fetch_many(urls, headers=None, max_workers=MAX_WORKERS):
+    """Fetch urls concurrently over the shared session, preserving order.
+
+    Failed requests are returned as the exception instead of a response so a
+    single bad file does not abort the whole batch.
+    """
+    if not urls:
+        return []
+
+    from requests import RequestException
+
+    def _get(url):
+        try:
+            return fetch(url, headers=headers)
+        except RequestException as e:
+            return e
+
+    workers = max(1, min(max_workers, MAX_WORKERS, len(urls)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(perf_trace.bind(_get), urls))
+
+
+def trees_url(repo_owner, repo_name, ref="HEAD", api_root=None):
+    return f"{api_root or API_ROOT}/repos/{repo_owner}/{repo_name}/git/trees/{ref}?recursive=1"
+
+
+# tree sha -> 已构建的索引
+_tree_indexes = {}
+_tree_indexes_lock = threading.Lock()
+
+
+def get_tree_index(repo_owner, repo_name, headers=None, prefix="data/", suffix=".txt", api_root=None, ttl=None):
+    """Index every file under prefix with a single recursive Git Trees call.
+
+    Returns (status_code, index) where index maps a directory path to its
+    files, each {'name', 'path', 'sha', 'size'}, sorted by name. The tree
+    itself is revalidated like any other listing, and the index is rebuilt
+    only when the tree SHA changes. index is None when the request failed.
+    """
+    status_code, tree = fetch_json_conditional(
+        trees_url(repo_owner, repo_name, api_root=api_root), headers=headers, ttl=ttl
+    )
+    if tree is None:
+        return status_code, None
+    
+    if tree.get('truncated'):
+        # 仓库过大时 GitHub 会截断结果，退回到逐目录列出
+        return 200, _contents_index(repo_owner, repo_name, headers, prefix.rstrip('/'), suffix, api_root)
+    
+    with _tree_indexes_lock:
+        index = _tree_indexes.get(tree['sha'])
+    if index is None:
+        index = {}
+        for item in tree['tree']:
+            path = item['path']
+            if item['type'] != 'blob' or not path.startswith(prefix) or not path.endswith(suffix):
+                continue
+            directory, name = path.rsplit('/', 1)
+            index.setdefault(directory, []).append(
+                {'name': name, 'path': path, 'sha': item['sha'], 'size': item.get('size', 0)}
+            )
+        for files in index.values():
+            files.sort(key=lambda entry: entry['name'])
+        with _tree_indexes_lock:
+            _tree_indexes.clear()
+            _tree_indexes[tree['sha']] = index
+    return 200, index
+
+
+def _contents_index(repo_owner, repo_name, headers, root, suffix, api_root=None):
+    index = {}
+    pending = [root]
+    while pending:
+        directory = pending.pop()
+        _, listing = fetch_json_conditional(
+            contents_url(repo_owner, repo_name, directory, api_root=api_root), headers=headers
+        )
+        for item in listing or []:
+            if item['type'] == 'dir':
+                pending.append(item['path'])
+            elif item['name'].endswith(suffix):
+                index.setdefault(directory, []).append(
+                    {'name': item['name'], 'path': item['path'], 'sha': item['sha'], 'size': item.get('size', 0)}
+                )
+    for files in index.values():
+        files.sort(key=lambda entry: entry['name'])
+    return index
@@ -0,0 +1,119 @@
+import hashlib
+import os
+import threading
+import time
+
+from record_parser import iter_dialogs
+
+# 跟随模式下的轮询间隔（秒）
+FOLLOW_INTERVAL = float(os.environ.get("DIALOG_FOLLOW_INTERVAL", 5))
+
+# 每次读取的最大字节数；首次跟随一个大文件时分块读入
+TAIL_CHUNK = 4 * 1024 * 1024
+
+# 与上次读到的末尾重叠读取的字节数，用来发现文件被改写而不是追加
+TAIL_OVERLAP = 64
+
+# 这么久（秒）没有被轮询的跟随文件被丢弃，其数据也从 store 删除
+TAIL_IDLE = float(os.environ.get("DIALOG_TAIL_IDLE", 600))
+
+
+class FileTail:
+    """Follows one growing full_state_Record file and stores only what was appended.
+
+    Each poll reads the bytes between the end of the last complete line seen
+    so far and the file's current size, parses the new complete lines and
+    appends them to the record store under a key that stays the same while
+    the file grows. A trailing partial line is left for the next poll. If
+    the file shrank or the bytes before the old end changed, it was
+    rewritten rather than appended to, and the tail starts over.
+    """
+
+    def __init__(self, source, path):
+        self.source = source
+        self.path = path
+        self.key = "tail-" + hashlib.sha1(f"{source.describe()}\0{path}".encode()).hexdigest()
+        self.offset = 0
+        self.dialogs = 0
+        self.new_dialogs = 0
+        self.polled_at = None
+        self._last_bytes = b''
+        self._read = None
+        self._lock = threading.Lock()
+
+    def _reset(self, store):
+        self.offset = 0
+        self.dialogs = store.begin_tail(self.key, self.path)
+        self._last_bytes = b''
+
+    def poll(self, store, size):
+        """Ingest the complete lines appended since the last poll; returns how many dialogs were added"""
+        with self._lock:
+            if self._read is None:
+                # 首次跟随：丢弃 store 中之前进程留下的同名数据
+                self._read = self.source.range_reader(self.path)
+                self._reset(store)
+            if size < self.offset or store.dialog_count(self.key) != self.dialogs:
+                # 文件变短，或 store 中的数据已被丢弃：从头开始
+                self._reset(store)
+
+            added = 0
+            while self.offset < size:
+                overlap = len(self._last_bytes)
+                data = self._read(self.offset - overlap, min(size - self.offset, TAIL_CHUNK) + overlap)
+                if data[:overlap] != self._last_bytes:
+                    # 旧内容变了：文件被改写，从头开始
+                    self._reset(store)
+                    added = 0
+                    continue
+                data = data[overlap:]
+                end = data.rfind(b'\n') + 1
+                if end == 0:
+                    if self.offset + len(data) < size:
+                        # 一行超过了单次读取的大小，扩大读取范围后重试
+                        data = self._read(self.offset, size - self.offset)
+                        end = data.rfind(b'\n') + 1
+                    if end == 0:
+                        break
+                lines = data[:end].splitlines(keepends=True)
+                count = store.append(self.key, self.path, iter_dialogs(lines))
+                added += count - self.dialogs
+                self.dialogs = count
+                self.offset += end
+                self._last_bytes = data[max(end - TAIL_OVERLAP, 0):end]
+
+            self.new_dialogs = added
+            self.polled_at = time.time()
+            return added
+
+
+_tails = {}
+_tails_lock = threading.Lock()
+
+
+def get_tail(source, path):
+    """Return the process-wide tail of one file of a data source"""
+    key = (source.describe(), path)
+    with _tails_lock:
+        tail = _tails.get(key)
+        if tail is None:
+            tail = _tails[key] = FileTail(source, path)
+    return tail
+
+
+def drop_idle_tails(store, idle=TAIL_IDLE):
+    """Forget the tails nobody polled for idle seconds and delete their data from the store"""
+    cutoff = time.time() - idle
+    with _tails_lock:
+        for key in [key for key, tail in _tails.items() if tail.polled_at is not None and tail.polled_at < cutoff]:
+            del _tails[key]
+        keep = {tail.key for tail in _tails.values()}
+    # 之前的进程留下的跟随数据也一并删除
+    return store.drop_tails(keep, idle)
+
+
+def tail_keys(source):
+    """Record-store keys of the files of a source that are being followed"""
+    with _tails_lock:
+        return [tail.key for (describe, _), tail in _tails.items()
+                if describe == source.describe() and tail.polled_at is not None]
@@ -0,0 +1,157 @@
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+# 设置后每次重跑的记录追加写入该 JSON lines 文件，便于离线分析
+LOG_PATH = os.environ.get("DIALOG_PERF_LOG")
+
+_local = threading.local()
+_log_lock = threading.Lock()
+
+
+class RerunTrace:
+    """Stage timings, bytes read and counter deltas of one script or fragment rerun.
+
+    counters maps a name to a function returning a dict of numbers, such as
+    a cache's stats(); the trace keeps how much each number changed during
+    the rerun. Stages may nest, so their times are inclusive.
+    """
+
+    def __init__(self, name, counters=None):
+        self.name = name
+        self.started_at = time.time()
+        self.elapsed = None
+        self.bytes = 0
+        self.memory_peak = None
+        self.stages = {}
+        self.counters = {}
+        self._counters = counters or {}
+        self._before = {key: read() for key, read in self._counters.items()}
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+
+    def add(self, stage, seconds=0.0, nbytes=0, calls=1):
+        with self._lock:
+            entry = self.stages.setdefault(stage, {'calls': 0, 'seconds': 0.0, 'bytes': 0})
+            entry['calls'] += calls
+            entry['seconds'] += seconds
+            entry['bytes'] += nbytes
+            self.bytes += nbytes
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self._start
+        if tracemalloc.is_tracing():
+            self.memory_peak = tracemalloc.get_traced_memory()[1]
+        for key, read in self._counters.items():
+            before, after = self._before[key], read()
+            self.counters[key] = {
+                name: after[name] - before.get(name, 0)
+                for name, value in after.items() if isinstance(value, (int, float))
+            }
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'started_at': self.started_at,
+            'elapsed': self.elapsed,
+            'bytes': self.bytes,
+            'memory_peak': self.memory_peak,
+            'stages': self.stages,
+            'counters': self.counters,
+        }
+
+
+def current():
+    """The trace of the rerun running in this thread, or None"""
+    return getattr(_local, 'trace', None)
+
+
+@contextlib.contextmanager
+def rerun(name, counters=None, on_finish=None):
+    """Trace a script or fragment rerun; inside a rerun that is already traced, join it"""
+    trace = current()
+    if trace is not None:
+        yield trace
+        return
+    trace = _local.trace = RerunTrace(name, counters)
+    _local.stages = []
+    try:
+        yield trace
+    finally:
+        _local.trace = None
+        trace.finish()
+        if on_finish is not None:
+            on_finish(trace)
+
+
+@contextlib.contextmanager
+def stage(name):
+    """Time a block as one stage of the current rerun; a no-op outside a traced rerun"""
+    trace = current()
+    if trace is None:
+        yield
+        return
+    _local.stages.append(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _local.stages.pop()
+        trace.add(name, time.perf_counter() - start)
+
+
+def add_bytes(nbytes):
+    """Count bytes read from the data source against the innermost open stage"""
+    trace = current()
+    if trace is not None:
+        stages = getattr(_local, 'stages', None)
+        trace.add(stages[-1] if stages else "read", nbytes=nbytes, calls=0)
+
+
+def bind(func):
+    """Wrap func so that it records into the caller's trace when run on a worker thread"""
+    trace = current()
+    if trace is None:
+        return func
+    stages = list(_local.stages)
+
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        saved = current(), getattr(_local, 'stages', None)
+        _local.trace, _local.stages = trace, list(stages)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _local.trace, _local.stages = saved
+    return run
+
+
+def memory_tracked():
+    return tracemalloc.is_tracing()
+
+
+def track_memory(enabled):
+    """Start or stop tracemalloc; it is process-wide and slows allocation-heavy code"""
+    if enabled and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not enabled and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def to_jsonl(traces):
+    return "".join(json.dumps(trace, ensure_ascii=False) + "\n" for trace in traces)
+
+
+def write_log(trace, path=LOG_PATH):
+    """Append a finished trace to the JSON lines log when one is configured"""
+    if not path:
+        return
+    with _log_lock:
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(to_jsonl([trace]))
@@ -0,0 +1,110 @@
+import ast
+import mmap
+
+import perf_trace
+
+READ_BUFFER = 1024 * 1024
+
+
+def iter_record_lines(lines):
+    """Yield the non-empty lines of a record stream without parsing them"""
+    for line in lines:
+        if line.strip():
+            yield line
+
+
+def parse_record(line):
+    """Parse one full_state_Record line (a Python-repr dict)"""
+    if isinstance(line, bytes):
+        line = line.decode('utf-8')
+    with perf_trace.stage("parse records"):
+        return ast.literal_eval(line)
+
+
+def iter_dialogs(lines):
+    """Lazily parse dialogs from a line stream, skipping malformed lines"""
+    for line in iter_record_lines(lines):
+        try:
+            yield parse_record(line)
+        except Exception:
+            continue
+
+
+def build_line_index(path):
+    """Return [offset, length] of every non-empty line in a record file"""
+    offsets = []
+    position = 0
+    with open(path, 'rb', buffering=READ_BUFFER) as f:
+        for line in f:
+            if line.strip():
+                offsets.append([position, len(line)])
+            position += len(line)
+    return offsets
+
+
+class RecordFile:
+    """Random-access view of a full_state_Record file.
+
+    Dialogs are located through a byte-offset line index, so reading one
+    dialog costs a single seek on the local file, or a single ranged read
+    through read_range when only the index is available locally. With
+    mapped=True the file is memory-mapped once and lines are sliced from
+    the mapping.
+    """
+
+    def __init__(self, path=None, sha=None, offsets=None, read_range=None, mapped=False):
+        if path is None and (offsets is None or read_range is None):
+            raise ValueError("RecordFile needs a local path or an index with read_range")
+        self.path = path
+        self.sha = sha
+        self._offsets = offsets
+        self._read_range = read_range
+        self._mapped = mapped
+        self._map = None
+
+    @property
+    def offsets(self):
+        if self._offsets is None:
+            self._offsets = build_line_index(self.path)
+        return self._offsets
+
+    def read_line(self, index):
+        offset, length = self.offsets[index]
+        if self.path is None:
+            return self._read_range(offset, length)
+        if self._mapped:
+            # 文件在映射之后变长（仍在写入）时重新映射
+            if self._map is None or offset + length > len(self._map):
+                self.close()
+                with open(self.path, 'rb') as f:
+                    self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return self._map[offset:offset + length]
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            return f.read(length)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            try:
+                yield self[index]
+            except ValueError:
+                continue
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        line = self.read_line(index)
+        try:
+            return parse_record(line)
+        except Exception as e:
+            raise ValueError(f"Dialog {index + 1} could not be parsed: {e}") from e
@@ -0,0 +1,629 @@
+import difflib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+from content_cache import CACHE_DIR
+from shared_cache import get_shared_cache
+
+STORE_PATH = os.environ.get("DIALOG_STORE_PATH", os.path.join(CACHE_DIR, "records.sqlite"))
+
+# "delta"：每个 prompt 只保存相对上一个同类 prompt 的差异；"full"：保存完整文本
+PROMPT_ENCODING = os.environ.get("DIALOG_PROMPT_ENCODING", "delta")
+
+# 表结构变化时递增，旧的 store 会被清空重建
+SCHEMA_VERSION = 6
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    sha TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    dialogs INTEGER NOT NULL,
+    ingested_at REAL NOT NULL,
+    growing INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS files_path ON files (path);
+CREATE TABLE IF NOT EXISTS dialogs (
+    sha TEXT NOT NULL,
+    dialog INTEGER NOT NULL,
+    reward REAL,
+    messages INTEGER NOT NULL,
+    extra TEXT,
+    turns INTEGER NOT NULL DEFAULT 0,
+    recommended INTEGER NOT NULL DEFAULT 0,
+    accepted INTEGER NOT NULL DEFAULT 0,
+    min_critic_reward REAL,
+    max_critic_reward REAL,
+    PRIMARY KEY (sha, dialog)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS messages (
+    sha TEXT NOT NULL,
+    dialog INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    turn INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT,
+    content_json INTEGER NOT NULL DEFAULT 0,
+    reward REAL,
+    user_preference TEXT,
+    extra TEXT,
+    PRIMARY KEY (sha, dialog, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS prompts (
+    sha TEXT NOT NULL,
+    dialog INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    prompt TEXT,
+    base_dialog INTEGER,
+    base_position INTEGER,
+    delta TEXT,
+    PRIMARY KEY (sha, dialog, position, kind)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS search_docs (
+    id INTEGER PRIMARY KEY,
+    sha TEXT NOT NULL,
+    dialog INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    turn INTEGER NOT NULL,
+    field TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS search_docs_sha ON search_docs (sha);
+"""
+TABLES = ('files', 'dialogs', 'messages', 'prompts', 'search_docs')
+
+# 全文索引：rowid 与 search_docs.id 对应；field 列只用于按字段过滤，不参与排名。
+# 索引不另存文本（external content），文本经 search_source 视图从 messages 读取；
+# 写入与删除索引都从同一个视图取值，保证两者一致
+SEARCH_SCHEMA = """
+CREATE VIEW IF NOT EXISTS search_source AS
+SELECT d.id, d.sha, d.field,
+    CASE
+        WHEN d.field = 'user_preference' THEN m.user_preference
+        WHEN m.content_json THEN (SELECT group_concat(value, char(10)) FROM json_each(m.content))
+        ELSE m.content
+    END AS text
+FROM search_docs d JOIN messages m ON m.sha = d.sha AND m.dialog = d.dialog AND m.position = d.position;
+CREATE VIRTUAL TABLE IF NOT EXISTS search USING fts5(
+    text, field, content='search_source', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+INSERT INTO search (search, rank) VALUES ('rank', 'bm25(1.0, 0.0)');
+"""
+
+# 参与全文检索的字段：消息内容、用户偏好与 critic 的输出
+SEARCH_FIELDS = ('content', 'user_preference', 'critic')
+
+# bm25 需逐条计算，常见词的匹配可达数十万条；只对所选文件中最新的这么多条匹配排名
+SEARCH_WINDOW = 10000
+SNIPPET_WIDTH = 160
+
+# messages 表中单独成列的字段；字符串类型的 *_prompt 字段存入 prompts 表
+MESSAGE_COLUMNS = ('role', 'content', 'reward', 'user_preference')
+
+
+def encode_delta(reference, text):
+    """Line-level delta of text against reference: [start, end] copies reference lines, a string is inserted"""
+    old_lines = reference.splitlines(keepends=True)
+    new_lines = text.splitlines(keepends=True)
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    delta = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            delta.append([i1, i2])
+        elif j2 > j1:
+            delta.append(''.join(new_lines[j1:j2]))
+    return delta
+
+
+def apply_delta(reference, delta):
+    old_lines = reference.splitlines(keepends=True)
+    return ''.join(
+        part if isinstance(part, str) else ''.join(old_lines[part[0]:part[1]])
+        for part in delta
+    )
+
+
+class _PromptEncoder:
+    """Turns the prompts of one record file into prompts-table rows.
+
+    The first prompt of each kind in the file is the shared template and is
+    stored in full. Every later prompt is a delta against the previous prompt
+    of the same kind in its dialog, or against the template for the first
+    turn of a dialog.
+    """
+
+    def __init__(self, sha, encoding=PROMPT_ENCODING):
+        self.sha = sha
+        self.encoding = encoding
+        self.templates = {}
+        self.previous = {}
+
+    def start_dialog(self):
+        self.previous = {}
+
+    def row(self, dialog_id, position, kind, text):
+        if not isinstance(text, str):
+            # 非字符串的 prompt 完整保存，也不作为后续差异的基准
+            return (self.sha, dialog_id, position, kind, text, None, None, None)
+        base = self.previous.get(kind)
+        if base is None:
+            base = self.templates.get(kind)
+        self.previous[kind] = (dialog_id, position, text)
+        if kind not in self.templates:
+            self.templates[kind] = (dialog_id, position, text)
+        if self.encoding != 'delta' or base is None:
+            return (self.sha, dialog_id, position, kind, text, None, None, None)
+        base_dialog, base_position, base_text = base
+        delta = json.dumps(encode_delta(base_text, text))
+        return (self.sha, dialog_id, position, kind, None, base_dialog, base_position, delta)
+
+
+def _search_fields(message):
+    """Fields of a message that go into the full-text index; the text itself is read from messages"""
+    content = message.get('content')
+    field = 'critic' if message.get('role') == 'critic' else 'content'
+    fields = [field] if isinstance(content, list) or isinstance(content, str) and content.strip() else []
+    if message.get('user_preference'):
+        fields.append('user_preference')
+    return fields
+
+
+# critic 的每条输出以 1-5 的判断开头；没有数字时按措辞识别
+# 1 尚未推荐，2 不感兴趣，3 拒绝，4 感兴趣或尚未决定，5 已接受
+_CRITIC_LEADING_SCORE = re.compile(r"^\W*(?:</think>\W*)?(?:Answer:\s*)?([1-5])\b")
+_CRITIC_PHRASES = (
+    ('not yet made a recommendation', 1),
+    ('not interested', 2),
+    ('rejected', 3),
+    ('has accepted', 5),
+    ('not yet accepted', 4),
+    ('not yet made a decision', 4),
+    ('not yet made a final decision', 4),
+    ('is interested', 4),
+)
+
+# 可用于筛选与排序的对话摘要列
+DIALOG_FACETS = ('dialog', 'reward', 'turns', 'recommended', 'accepted', 'min_critic_reward', 'max_critic_reward')
+
+
+def critic_score(outputs):
+    """The 1-5 verdict most of a critic's sampled outputs agree on, or None"""
+    votes = Counter()
+    for output in outputs if isinstance(outputs, list) else [outputs]:
+        output = str(output)
+        match = _CRITIC_LEADING_SCORE.match(output)
+        if match:
+            votes[int(match.group(1))] += 1
+            continue
+        head = output[:200]
+        for phrase, score in _CRITIC_PHRASES:
+            if phrase in head:
+                votes[score] += 1
+                break
+    return votes.most_common(1)[0][0] if votes else None
+
+
+def dialog_facets(messages):
+    """(turns, recommended, accepted, min critic reward, max critic reward) of one dialog"""
+    turns = sum(message.get('role') == 'Recommender' for message in messages)
+    critics = [message for message in messages if message.get('role') == 'critic']
+    scores = [score for score in (critic_score(message.get('content')) for message in critics) if score is not None]
+    rewards = [message['reward'] for message in critics if isinstance(message.get('reward'), (int, float))]
+    return (
+        turns,
+        int(any(score >= 2 for score in scores)),
+        int(bool(scores) and scores[-1] == 5),
+        min(rewards) if rewards else None,
+        max(rewards) if rewards else None,
+    )
+
+
+def search_query(text, fields=SEARCH_FIELDS):
+    """Turn free text into an FTS5 query: every word must match, 'word*' matches a prefix"""
+    terms = []
+    for word in text.split():
+        prefix = word.endswith('*') and len(word) > 1
+        word = word.rstrip('*').replace('"', '""')
+        if word:
+            terms.append(f'"{word}"*' if prefix else f'"{word}"')
+    if not terms or not fields:
+        return ''
+    query = '{text} : (' + ' '.join(terms) + ')'
+    if set(SEARCH_FIELDS) - set(fields):
+        query += ' AND {field} : (' + ' OR '.join(f'"{field}"' for field in fields) + ')'
+    return query
+
+
+def search_pattern(text):
+    """Regex that finds the words of a search in a text, as the FTS tokenizer would match them"""
+    words = [
+        re.escape(word.rstrip('*')) + (r'\w*' if word.endswith('*') else r'\b')
+        for word in text.split() if word.rstrip('*')
+    ]
+    return re.compile(r'\b(?:' + '|'.join(words) + ')', re.IGNORECASE) if words else None
+
+
+def search_snippet(text, pattern, width=SNIPPET_WIDTH):
+    """About width characters of text around its first match, matches wrapped in \x02 ... \x03"""
+    match = pattern.search(text) if pattern else None
+    start = max((match.start() if match else 0) - width // 4, 0)
+    if start:
+        # 从单词边界开始
+        space = text.find(' ', start)
+        start = space + 1 if 0 <= space < start + 20 else start
+    end = min(start + width, len(text))
+    window = text[start:end]
+    if pattern:
+        window = pattern.sub(lambda m: f'\x02{m.group()}\x03', window)
+    return ('…' if start else '') + window + ('…' if end < len(text) else '')
+
+
+def _message_rows(sha, dialog_id, messages, prompt_encoder):
+    turn = 0
+    for position, message in enumerate(messages):
+        role = message.get('role', '')
+        if role == 'Recommender':
+            turn += 1
+        content = message.get('content')
+        content_json = not isinstance(content, str) and content is not None
+        # 只有字符串 prompt 存入 prompts 表；其他类型（None、dict 等）很小，随 extra 以 JSON 保存
+        extra = {
+            key: value for key, value in message.items()
+            if key not in MESSAGE_COLUMNS and not (key.endswith('_prompt') and isinstance(value, str))
+        }
+        prompts = [
+            prompt_encoder.row(dialog_id, position, key, value)
+            for key, value in message.items() if key.endswith('_prompt') and isinstance(value, str)
+        ]
+        row = (
+            sha, dialog_id, position, turn, role,
+            json.dumps(content) if content_json else content,
+            int(content_json),
+            message.get('reward'),
+            message.get('user_preference'),
+            json.dumps(extra) if extra else None,
+        )
+        yield row, prompts, _search_fields(message)
+
+
+class RecordStore:
+    """SQLite store of parsed full_state_Record files, keyed by file SHA.
+
+    Each record file is ingested once into one row per dialog and one row
+    per message (role, turn, content, reward); the large prompt strings live
+    in a separate table so listing, aggregating and rendering dialogs never
+    read them unless asked to.
+    """
+
+    def __init__(self, path=STORE_PATH):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # 正在追加的文件的 prompt 编码状态，按 sha 保存
+        self._encoders = {}
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            with self._conn:
+                for table in TABLES + ('search',):
+                    self._conn.execute(f"DROP TABLE IF EXISTS {table}")
+                self._conn.execute("DROP VIEW IF EXISTS search_source")
+                self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._conn.executescript(SCHEMA)
+        try:
+            self._conn.executescript(SEARCH_SCHEMA)
+            self.searchable = True
+        except sqlite3.OperationalError:
+            # SQLite 未编译 FTS5 时不提供全文检索
+            self.searchable = False
+
+    def has_file(self, sha):
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM files WHERE sha = ?", (sha,)).fetchone()
+        return row is not None
+
+    def ingest(self, sha, path, dialogs):
+        """Store every dialog of one record file; dialogs is any iterable of parsed records.
+
+        Only the newest version of a path is kept: the rows of every other
+        sha stored for it are dropped, except those of files being followed
+        with append.
+        """
+        # 解析在锁外进行，其他会话的读取只需等待写入
+        rows = self._rows(sha, dialogs, 0, _PromptEncoder(sha))
+        with self._lock, self._conn:
+            stale = [row[0] for row in self._conn.execute(
+                "SELECT sha FROM files WHERE path = ? AND sha != ? AND NOT growing", (path, sha)
+            )]
+            for old in [sha] + stale:
+                self._delete(old)
+            return self._insert(sha, path, rows)
+
+    def _delete(self, sha):
+        if self.searchable:
+            # external content 的索引删除时需要原来写入的值，须在删除 messages 之前
+            self._conn.execute(
+                "INSERT INTO search (search, rowid, text, field) "
+                "SELECT 'delete', id, text, field FROM search_source WHERE sha = ?", (sha,)
+            )
+        for table in TABLES:
+            self._conn.execute(f"DELETE FROM {table} WHERE sha = ?", (sha,))
+        self._encoders.pop(sha, None)
+        # 内容被替换或删除：丢弃共享缓存中这个文件的对话
+        get_shared_cache().discard(lambda key: key[1:3] == (self.path, sha))
+
+    def begin_tail(self, key, path):
+        """Start storing a followed file under key from scratch; other versions of path are kept"""
+        with self._lock, self._conn:
+            self._delete(key)
+            self._conn.execute("INSERT INTO files VALUES (?, ?, 0, ?, 1)", (key, path, time.time()))
+        return 0
+
+    def drop_tails(self, keep=(), idle=0):
+        """Delete the rows of followed files whose keys are not in keep and that have not grown for idle seconds"""
+        with self._lock, self._conn:
+            keys = [row[0] for row in self._conn.execute(
+                "SELECT sha FROM files WHERE growing AND ingested_at < ?", (time.time() - idle,)
+            ) if row[0] not in keep]
+            for key in keys:
+                self._delete(key)
+        return keys
+
+    def append(self, sha, path, dialogs):
+        """Store dialogs appended to a growing file after the ones already stored under sha.
+
+        Prompt deltas continue from the previous append, so a file that is
+        followed while it is written is stored as if it had been ingested
+        once. Returns the number of dialogs now stored.
+        """
+        # 追加只来自同一个 FileTail，期间不会有别的写入改变已有的对话数
+        with self._lock:
+            row = self._conn.execute("SELECT dialogs FROM files WHERE sha = ?", (sha,)).fetchone()
+            prompt_encoder = self._encoders.setdefault(sha, _PromptEncoder(sha))
+        rows = self._rows(sha, dialogs, row[0] if row else 0, prompt_encoder)
+        with self._lock, self._conn:
+            return self._insert(sha, path, rows, growing=True)
+
+    def _rows(self, sha, dialogs, first_dialog, prompt_encoder):
+        """Parse dialogs into table rows without touching the database"""
+        rows = {'count': first_dialog, 'dialogs': [], 'messages': [], 'prompts': [], 'docs': []}
+        for dialog_id, dialog in enumerate(dialogs, first_dialog):
+            prompt_encoder.start_dialog()
+            messages = dialog.get('full_state', [])
+            extra = {key: value for key, value in dialog.items() if key not in ('full_state', 'reward')}
+            rows['dialogs'].append(
+                (sha, dialog_id, dialog.get('reward'), len(messages), json.dumps(extra) if extra else None)
+                + dialog_facets(messages)
+            )
+            for row, prompts, fields in _message_rows(sha, dialog_id, messages, prompt_encoder):
+                rows['messages'].append(row)
+                rows['prompts'].extend(prompts)
+                if self.searchable:
+                    rows['docs'].extend((sha, dialog_id, row[2], row[3], field) for field in fields)
+            rows['count'] = dialog_id + 1
+        return rows
+
+    def _insert(self, sha, path, rows, growing=False):
+        self._conn.executemany("INSERT INTO dialogs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows['dialogs'])
+        self._conn.executemany("INSERT INTO messages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows['messages'])
+        self._conn.executemany("INSERT INTO prompts VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows['prompts'])
+        if rows['docs']:
+            # 这一批的 search_docs.id 从 first_id 起连续分配，索引随后按 id 范围从 search_source 写入
+            first_id = self._conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM search_docs").fetchone()[0]
+            self._conn.executemany(
+                "INSERT INTO search_docs (id, sha, dialog, position, turn, field) VALUES (?, ?, ?, ?, ?, ?)",
+                [(doc_id,) + doc for doc_id, doc in enumerate(rows['docs'], first_id)]
+            )
+            self._conn.execute(
+                "INSERT INTO search (rowid, text, field) SELECT id, text, field FROM search_source WHERE id >= ?",
+                (first_id,)
+            )
+        self._conn.execute(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+            (sha, path, rows['count'], time.time(), int(growing))
+        )
+        return rows['count']
+
+    def dialog_count(self, sha):
+        with self._lock:
+            row = self._conn.execute("SELECT dialogs FROM files WHERE sha = ?", (sha,)).fetchone()
+        return row[0] if row else 0
+
+    def file_summary(self, sha):
+        """Per-file aggregates computed from the dialogs table only"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*), AVG(reward), MIN(reward), MAX(reward), AVG(messages), "
+                "MAX(turns), SUM(recommended), SUM(accepted) FROM dialogs WHERE sha = ?", (sha,)
+            ).fetchone()
+        keys = ('dialogs', 'mean_reward', 'min_reward', 'max_reward', 'mean_messages',
+                'max_turns', 'recommended', 'accepted')
+        return dict(zip(keys, row))
+
+    def dialog_table(self, sha, reward=None, turns=None, recommended=None, accepted=None, order_by='dialog'):
+        """Per-dialog summary rows of one file that pass the filters, as dicts keyed by DIALOG_FACETS.
+
+        reward and turns are (low, high) inclusive ranges, recommended and
+        accepted True/False or None for either; order_by is a facet name,
+        optionally followed by ' DESC'. Only the dialogs table is read.
+        """
+        column, _, direction = order_by.partition(' ')
+        if column not in DIALOG_FACETS or direction not in ('', 'DESC'):
+            raise ValueError(f"Cannot sort dialogs by {order_by!r}")
+        sql = f"SELECT {', '.join(DIALOG_FACETS)} FROM dialogs WHERE sha = ?"
+        params = [sha]
+        for name, bounds in (('reward', reward), ('turns', turns)):
+            if bounds is not None:
+                sql += f" AND {name} BETWEEN ? AND ?"
+                params.extend(bounds)
+        for name, flag in (('recommended', recommended), ('accepted', accepted)):
+            if flag is not None:
+                sql += f" AND {name} = ?"
+                params.append(int(flag))
+        # 排序值相同（或为空）时按对话编号
+        sql += f" ORDER BY {column} IS NULL, {column} {direction}, dialog"
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [dict(zip(DIALOG_FACETS, row)) for row in rows]
+
+    def dialog_turns(self, sha, dialog_id):
+        """Number of the last turn of a dialog; turn 0 is the opening Seeker message"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MAX(turn) FROM messages WHERE sha = ? AND dialog = ?", (sha, dialog_id)
+            ).fetchone()
+        return row[0] or 0
+
+    def load_dialog(self, sha, dialog_id, with_prompts=True, turns=None):
+        """Rebuild one dialog in the original {'full_state': [...], 'reward': ...} shape.
+
+        turns=(first, last) loads only the messages of those turns (inclusive);
+        the position of the first loaded message is returned as 'first_position'.
+        Results are kept in the process-wide shared cache and handed to every
+        session, so callers must not modify them.
+        """
+        key = ('dialog', self.path, sha, dialog_id, with_prompts, turns)
+        return get_shared_cache().get_or_load(
+            key, lambda: self._load_dialog(sha, dialog_id, with_prompts, turns)
+        )
+
+    def _load_dialog(self, sha, dialog_id, with_prompts, turns):
+        first_turn, last_turn = turns if turns is not None else (0, -1)
+        with self._lock:
+            dialog_row = self._conn.execute(
+                "SELECT reward, extra FROM dialogs WHERE sha = ? AND dialog = ?", (sha, dialog_id)
+            ).fetchone()
+            if dialog_row is None:
+                return None
+            rows = self._conn.execute(
+                "SELECT position, role, content, content_json, reward, user_preference, extra "
+                "FROM messages WHERE sha = ? AND dialog = ? AND turn >= ? AND (turn <= ? OR ? < 0) "
+                "ORDER BY position", (sha, dialog_id, first_turn, last_turn, last_turn)
+            ).fetchall()
+            positions = [row[0] for row in rows]
+            prompt_keys = self._conn.execute(
+                "SELECT position, kind FROM prompts WHERE sha = ? AND dialog = ? "
+                "AND position BETWEEN ? AND ? ORDER BY position",
+                (sha, dialog_id, positions[0], positions[-1])
+            ).fetchall() if with_prompts and positions else []
+
+        prompts = {}
+        resolved = {}
+        for position, kind in prompt_keys:
+            prompts.setdefault(position, {})[kind] = self._resolve_prompt(sha, dialog_id, position, kind, resolved)
+
+        messages = []
+        for position, role, content, content_json, reward, user_preference, extra in rows:
+            message = {'role': role, 'content': json.loads(content) if content_json else content}
+            if role == 'Recommender' or user_preference is not None:
+                message['user_preference'] = user_preference
+            message.update(prompts.get(position, {}))
+            if reward is not None:
+                message['reward'] = reward
+            if extra:
+                message.update(json.loads(extra))
+            messages.append(message)
+
+        dialog = {'full_state': messages, 'reward': dialog_row[0]}
+        if dialog_row[1]:
+            dialog.update(json.loads(dialog_row[1]))
+        if turns is not None:
+            dialog['first_position'] = positions[0] if positions else 0
+        return dialog
+
+    def search(self, text, shas=None, fields=SEARCH_FIELDS, limit=50):
+        """Ranked full-text hits over every ingested file, best first.
+
+        Each hit is a dict with sha, path, dialog, turn, position, field and
+        a snippet whose matches are wrapped in \x02 ... \x03. fields picks
+        which of SEARCH_FIELDS to search and shas limits the search to those
+        files. Only the newest SEARCH_WINDOW matches are ranked, so a very
+        common word finds the best hits among recent messages.
+        """
+        query = search_query(text, fields)
+        if not self.searchable or not query:
+            return []
+        hits = self._search_hits(query, shas, limit)
+        with self._lock:
+            texts = dict(self._conn.execute(
+                "SELECT id, text FROM search_source WHERE id IN (SELECT value FROM json_each(?))",
+                (json.dumps([hit['id'] for hit in hits]),)
+            ).fetchall()) if hits else {}
+        pattern = search_pattern(text)
+        for hit in hits:
+            hit['snippet'] = search_snippet(texts.get(hit.pop('id'), ''), pattern)
+        return hits
+
+    def _search_hits(self, query, shas, limit):
+        # 按 rowid 倒序扫描匹配并在扫描中按文件过滤，rank 只对窗口内的行计算；
+        # 排名完成后才与 files 连接
+        sql = (
+            "WITH recent AS (SELECT s.rowid AS id, s.rank AS rank FROM search s "
+            "JOIN search_docs d ON d.id = s.rowid WHERE search MATCH ?"
+        )
+        params = [query]
+        if shas is not None:
+            sql += " AND d.sha IN (SELECT value FROM json_each(?))"
+            params.append(json.dumps(list(shas)))
+        sql += (
+            " ORDER BY s.rowid DESC LIMIT ?) "
+            "SELECT d.id, d.sha, f.path, d.dialog, d.turn, d.position, d.field FROM recent "
+            "JOIN search_docs d ON d.id = recent.id JOIN files f ON f.sha = d.sha "
+            "ORDER BY recent.rank LIMIT ?"
+        )
+        params += [SEARCH_WINDOW, limit]
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        keys = ('id', 'sha', 'path', 'dialog', 'turn', 'position', 'field')
+        return [dict(zip(keys, row)) for row in rows]
+
+    def load_prompt(self, sha, dialog_id, position, kind):
+        """Rebuild a single prompt from its template and the deltas leading to it"""
+        key = ('prompt', self.path, sha, dialog_id, position, kind)
+        return get_shared_cache().get_or_load(
+            key, lambda: self._resolve_prompt(sha, dialog_id, position, kind, {})
+        )
+
+    def _resolve_prompt(self, sha, dialog_id, position, kind, resolved):
+        # 一条消息可以有多种 prompt，resolved 在各种之间共享，键中须包含 kind
+        key = (dialog_id, position, kind)
+        chain = []
+        # 沿着 base 引用回溯到完整保存的模板
+        while key not in resolved:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT prompt, base_dialog, base_position, delta FROM prompts "
+                    "WHERE sha = ? AND dialog = ? AND position = ? AND kind = ?",
+                    (sha, key[0], key[1], kind)
+                ).fetchone()
+            if row is None:
+                return None
+            prompt, base_dialog, base_position, delta = row
+            if delta is None:
+                resolved[key] = prompt
+                break
+            chain.append((key, delta))
+            key = (base_dialog, base_position, kind)
+
+        text = resolved[key]
+        for chain_key, delta in reversed(chain):
+            text = apply_delta(text, json.loads(delta))
+            resolved[chain_key] = text
+        return resolved[(dialog_id, position, kind)]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Return the process-wide record store"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = RecordStore()
+    return _store
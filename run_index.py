@@ -0,0 +1,220 @@
+import re
+import threading
+from collections import Counter, namedtuple
+
+import numpy as np
+
+from eval_metrics import OVERALL_METRICS
+
+# 由文件名解析出的键：同一 (run, model, version) 的文件构成一条随 epoch 变化的曲线
+RunKey = namedtuple('RunKey', ['run', 'model', 'epoch', 'version', 'kind', 'archive'])
+
+# Evaluate-epoch-3_v2-inspired-#data1#...#sft_inspired_initial_label#-qwen2.5-qwen2.5-qwen2.5.txt
+_RUN_NAME = re.compile(
+    r"^(?P<kind>Evaluate|full_state_Record)-epoch-(?P<epoch>\d+)(?:_v(?P<version>\d+))?"
+    r"-(?P<dataset>[^-#]+)-#(?P<source>.*)#-(?P<models>[^#]+)\.txt$"
+)
+
+
+def parse_run_name(path):
+    """Parse a data file path into a RunKey, or None when the name does not follow the convention"""
+    directory, _, name = path.rpartition('/')
+    match = _RUN_NAME.match(name)
+    if match is None:
+        return None
+    models = match.group('models').split('-')
+    # 三个角色使用同一模型时只保留一个名字
+    model = models[0] if len(set(models)) == 1 else '/'.join(models)
+    source = [part for part in match.group('source').split('#') if part]
+    run = f"{match.group('dataset')}:{source[-1]}" if source else match.group('dataset')
+    base_dir = directory.rsplit('/', 1)[-1]
+    archive = base_dir.rsplit('_before_', 1)[1] if '_before_' in base_dir else None
+    return RunKey(
+        run=run,
+        model=model,
+        epoch=int(match.group('epoch')),
+        version=int(match.group('version') or 0),
+        kind=match.group('kind'),
+        archive=archive,
+    )
+
+
+class MetricsMatrix:
+    """Metrics of many eval files as arrays indexed by epoch.
+
+    overall is an epochs × len(OVERALL_METRICS) array and turns an
+    epochs × turns array of SR-turn@k; missing values are NaN. Rows are
+    kept sorted by epoch so every query is a vectorized array operation.
+    """
+
+    def __init__(self, epochs, overall, turns):
+        order = np.argsort(epochs, kind='stable')
+        self.epochs = np.asarray(epochs)[order]
+        self.overall = np.asarray(overall, dtype=float).reshape(len(order), len(OVERALL_METRICS))[order]
+        self.turns = np.asarray(turns, dtype=float).reshape(len(order), -1)[order]
+
+    @classmethod
+    def from_records(cls, epochs, records):
+        records = list(records)
+        width = max((len(record.sr_turns) for record in records), default=0)
+        overall = np.full((len(records), len(OVERALL_METRICS)), np.nan)
+        turns = np.full((len(records), width), np.nan)
+        for row, record in enumerate(records):
+            overall[row] = [np.nan if value is None else value
+                            for value in (record.sr, record.avg_turns, record.rewards)]
+            turns[row, :len(record.sr_turns)] = [np.nan if value is None else value for value in record.sr_turns]
+        return cls(np.asarray(epochs, dtype=int), overall, turns)
+
+    def append(self, epochs, records):
+        """A matrix with rows for more eval files; only the new records are converted"""
+        extra = MetricsMatrix.from_records(epochs, records)
+        width = max(self.turns.shape[1], extra.turns.shape[1])
+        turns = np.full((len(self) + len(extra), width), np.nan)
+        turns[:len(self), :self.turns.shape[1]] = self.turns
+        turns[len(self):, :extra.turns.shape[1]] = extra.turns
+        return MetricsMatrix(
+            np.concatenate([self.epochs, extra.epochs]), np.vstack([self.overall, extra.overall]), turns
+        )
+
+    def __len__(self):
+        return len(self.epochs)
+
+    def metric(self, name):
+        return self.overall[:, OVERALL_METRICS.index(name)]
+
+    def select(self, mask):
+        """Rows where the boolean mask is true"""
+        return MetricsMatrix(self.epochs[mask], self.overall[mask], self.turns[mask])
+
+    def epoch_range(self, first, last):
+        return self.select((self.epochs >= first) & (self.epochs <= last))
+
+    def moving_average(self, window):
+        """Trailing moving average over epochs; the first window-1 rows average what is available"""
+        if window <= 1 or len(self) == 0:
+            return self
+
+        def smooth(values):
+            valid = ~np.isnan(values)
+            sums = np.cumsum(np.where(valid, values, 0.0), axis=0)
+            counts = np.cumsum(valid, axis=0)
+            sums[window:] -= sums[:-window].copy()
+            counts[window:] -= counts[:-window].copy()
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return np.where(counts > 0, sums / counts, np.nan)
+
+        return MetricsMatrix(self.epochs, smooth(self.overall), smooth(self.turns))
+
+    def best_epoch(self, name, maximize=True):
+        """(epoch, value) of the best row for one overall metric, or None when it is missing everywhere"""
+        values = self.metric(name)
+        if np.isnan(values).all():
+            return None
+        row = np.nanargmax(values) if maximize else np.nanargmin(values)
+        return int(self.epochs[row]), float(values[row])
+
+    def deltas(self):
+        """Change of every overall metric from one epoch to the next, (epochs - 1) × metrics"""
+        return np.diff(self.overall, axis=0)
+
+
+def series_label(run, model, version, archive):
+    label = f"{model} · {run}"
+    if version:
+        label += f" · v{version}"
+    if archive:
+        label += f" · before {archive}"
+    return label
+
+
+class RunIndex:
+    """Incremental index of data files by RunKey, across all data directories.
+
+    update() only parses the names of files it has not seen at their
+    current SHA, and metrics_table() rebuilds a series' matrix only when
+    the set of files in that series changed.
+    """
+
+    def __init__(self):
+        self.files = {}
+        self.unparsed = set()
+        self._matrices = {}
+        self._lock = threading.Lock()
+
+    def update(self, entries):
+        """Sync the index with a listing of {'path', 'sha'} entries; returns the number of new or changed files"""
+        changed = 0
+        with self._lock:
+            current = {entry['path']: entry['sha'] for entry in entries}
+            for path in list(self.files):
+                if path not in current:
+                    del self.files[path]
+            self.unparsed &= set(current)
+            for path, sha in current.items():
+                known = self.files.get(path)
+                if known is not None and known[0] == sha or path in self.unparsed:
+                    continue
+                key = parse_run_name(path)
+                if key is None:
+                    self.unparsed.add(path)
+                    continue
+                self.files[path] = (sha, key)
+                changed += 1
+        return changed
+
+    def series(self, kind='Evaluate'):
+        """{(run, model, version, archive): [(epoch, sha, path), ...]} sorted by epoch"""
+        grouped = {}
+        with self._lock:
+            for path, (sha, key) in self.files.items():
+                if key.kind == kind:
+                    group = (key.run, key.model, key.version, key.archive)
+                    grouped.setdefault(group, []).append((key.epoch, sha, path))
+        for files in grouped.values():
+            files.sort()
+        return grouped
+
+    def metrics_table(self, metrics_by_sha):
+        """{series label: MetricsMatrix} for every eval series whose files have parsed metrics"""
+        table = {}
+        for group, files in sorted(self.series('Evaluate').items()):
+            files = [(epoch, sha) for epoch, sha, _ in files if metrics_by_sha.get(sha) is not None]
+            if not files:
+                continue
+            shas = tuple(sha for _, sha in files)
+            with self._lock:
+                cached = self._matrices.get(group)
+            if cached is None or cached[0] != shas:
+                added = Counter(shas) - Counter(cached[0]) if cached else None
+                if cached and sum(added.values()) == len(shas) - len(cached[0]):
+                    # 只是新增了 epoch：在原矩阵后追加新行
+                    new_files = []
+                    for epoch, sha in files:
+                        if added[sha]:
+                            added[sha] -= 1
+                            new_files.append((epoch, sha))
+                    matrix = cached[1].append(
+                        [epoch for epoch, _ in new_files], [metrics_by_sha[sha] for _, sha in new_files]
+                    )
+                else:
+                    matrix = MetricsMatrix.from_records(
+                        [epoch for epoch, _ in files], [metrics_by_sha[sha] for sha in shas]
+                    )
+                cached = (shas, matrix)
+                with self._lock:
+                    self._matrices[group] = cached
+            table[series_label(*group)] = cached[1]
+        return table
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_run_index():
+    """Return the process-wide run index"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = RunIndex()
+    return _index
@@ -0,0 +1,160 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+# 进程内共享缓存的内存上限，所有会话共用
+MAX_BYTES = int(float(os.environ.get("DIALOG_MEMORY_CACHE_MB", 256)) * 1024 * 1024)
+
+
+def approx_size(value):
+    """Rough number of bytes held by a parsed value (dicts, lists, strings, arrays)"""
+    # numpy 数组按数据大小计算；这里不导入 numpy，只看 nbytes
+    if hasattr(value, 'nbytes'):
+        return value.nbytes
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(approx_size(key) + approx_size(item) for key, item in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(approx_size(item) for item in value)
+    return size
+
+
+class _Flight:
+    """One load in progress; later callers for the same key wait on it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SharedCache:
+    """Process-wide LRU of parsed values, bounded by memory and shared by all sessions.
+
+    get_or_load() runs a key's loader once however many sessions ask for it
+    at the same time: the first caller loads, the others wait for its result
+    (single-flight). coalesce() does the same for work whose result lives
+    elsewhere, such as ingesting a file into the record store.
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._flights = {}
+        self._loaded = set()
+        self._lock = threading.Lock()
+        self.counters = {
+            'requests': 0,
+            'hits': 0,
+            'coalesced': 0,
+            'loads': 0,
+            'duplicate_loads': 0,
+            'evictions': 0,
+            'errors': 0,
+        }
+
+    def get(self, key):
+        """The cached value of key, or None; never loads"""
+        with self._lock:
+            self.counters['requests'] += 1
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.counters['hits'] += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = approx_size(value)
+        with self._lock:
+            if key not in self._entries:
+                self._put(key, value, size)
+
+    def get_or_load(self, key, load, cache=True):
+        """Return the value of key, calling load() at most once across concurrent callers"""
+        with self._lock:
+            self.counters['requests'] += 1
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.counters['hits'] += 1
+                return entry[0]
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.counters['coalesced'] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        size = None
+        try:
+            flight.value = load()
+            if cache and flight.value is not None:
+                size = approx_size(flight.value)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+                if flight.error is not None:
+                    self.counters['errors'] += 1
+                else:
+                    self.counters['loads'] += 1
+                if size is not None:
+                    # 同一个值又加载了一次：之前被淘汰了
+                    if key in self._loaded:
+                        self.counters['duplicate_loads'] += 1
+                    self._loaded.add(key)
+                    self._put(key, flight.value, size)
+            flight.done.set()
+        return flight.value
+
+    def coalesce(self, key, run):
+        """Run run() once for all concurrent callers of key without keeping the result"""
+        return self.get_or_load(key, run, cache=False)
+
+    def _put(self, key, value, size):
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (value, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._bytes -= evicted
+            self.counters['evictions'] += 1
+
+    def discard(self, match):
+        """Drop every cached value whose key satisfies match(key)"""
+        with self._lock:
+            for key in [key for key in self._entries if match(key)]:
+                _, size = self._entries.pop(key)
+                self._bytes -= size
+            self._loaded = {key for key in self._loaded if not match(key)}
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats.update(entries=len(self._entries), bytes=self._bytes, in_flight=len(self._flights))
+        return stats
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_cache():
+    """Return the process-wide shared cache"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = SharedCache()
+    return _shared
@@ -1,114 +1,101 @@
 import streamlit as st
-import requests
-import json
-import base64
-import urllib.parse
 import html
-import ast
-import plotly.graph_objects as go
 import re
+import time
+import os
+import github_fetch
+import perf_trace
+from content_cache import get_cache
+from shared_cache import get_shared_cache
+from data_sources import DataSourceError, list_data_files, source_from_config
+from record_store import SEARCH_FIELDS, get_store
+from eval_metrics import OVERALL_METRICS, cached_eval_metrics, load_eval_metrics
+from live_tail import FOLLOW_INTERVAL, drop_idle_tails, get_tail, tail_keys
+# numpy、plotly 以及依赖它们的 run_index、charts 只有指标分析页用到，
+# 在该页第一次打开时才导入，登录页与对话页的冷启动不必加载
 
-def parse_dialog_data(text):
-    """解析多行JSON数据，每行是一个独立的对话"""
-    dialogs = []
-    for line in text.strip().split('\n'):
-        if line.strip():  # 忽略空行
-            try:
-                dialog = json.loads(line.strip())
-                dialogs.append(dialog)
-            except json.JSONDecodeError as e:
-                st.error(f"Error parsing line: {e}")
-                continue
-    return dialogs
-
-def display_dialog(dialog):
-    # 添加一个容器来展示对话
-    with st.container():
-        # 显示reward，使用更醒目的格式
-        st.info(f"💎 Reward: {dialog['reward']}")
-        
-        # 使用列表来展示对话
-        for message in dialog['dialog']:
-            role = message['role']
-            content = message['content']
-            
-            # 使用不同的样式显示不同角色的消息
-            if role == 'Seeker':
-                st.write(f'👤 **Seeker**')
-                st.write(content)
-            else:
-                st.write(f'🤖 **Recommender**')
-                st.write(content)
-            
-            # 添加一个小间隔
-            st.write("")
-        
-        # 添加分隔线
-        st.divider()
-
-def get_github_files(repo_owner, repo_name, path, token):
-    url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/contents/{path}"
-    headers = {
-        "Authorization": f"token {token}",
-        "Accept": "application/vnd.github.v3+json"
-    }
-    response = requests.get(url, headers=headers)
-    
-    if response.status_code != 200:
-        st.error(f"GitHub API Error: {response.status_code}")
-        return []
-    
-    files = [file['name'] for file in response.json() if file['type'] == 'file' and file['name'].endswith('.txt')]
-    return files
+def get_data_source():
+    """The configured data source: Streamlit secrets first, then environment variables"""
+    config = dict(os.environ)
+    try:
+        config.update({key: value for key, value in st.secrets.items() if isinstance(value, str)})
+    except Exception:
+        # 没有 secrets.toml 时只使用环境变量
+        pass
+    return source_from_config(config)
 
-def read_github_file(repo_owner, repo_name, file_path, token):
-    # URL encode each path component separately
-    encoded_path = '/'.join(urllib.parse.quote(part, safe='') for part in file_path.split('/'))
-    url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/contents/{encoded_path}"
-    
-    headers = {
-        "Authorization": f"token {token}",
-        "Accept": "application/vnd.github.v3+json"
-    }
-    
-    response = requests.get(url, headers=headers)
-    if response.status_code != 200:
-        st.error(f"Error fetching file: {response.status_code}")
-        return None
-        
+# 性能面板比较每次重跑前后的这些计数器
+PERF_COUNTERS = {
+    'blob cache': lambda: get_cache().stats(),
+    'shared cache': lambda: get_shared_cache().stats(),
+    'listings': github_fetch.get_listing_stats,
+}
+# 每个会话保留的最近重跑记录数
+PERF_HISTORY = 200
+
+def record_trace(trace):
+    history = st.session_state.setdefault("perf_history", [])
+    history.append(trace.to_dict())
+    del history[:-PERF_HISTORY]
+    perf_trace.write_log(history[-1])
+
+def traced_rerun(name):
+    """Collect the stage timings of a script or fragment rerun into the session's history"""
+    return perf_trace.rerun(name, counters=PERF_COUNTERS, on_finish=record_trace)
+
+def get_data_index(source, ttl=None):
+    """Map every data directory (archives included) to its files"""
     try:
-        file_info = response.json()
-        download_url = file_info.get('download_url')
-        
-        if not download_url:
-            st.error("No download URL found")
-            return None
-            
-        # 直接下载文件内容
-        file_response = requests.get(download_url, headers=headers)
-        if file_response.status_code != 200:
-            st.error(f"File download failed: {file_response.status_code}")
-            return None
-            
-        content = file_response.text
-        
-        # 显示行数统计
-        lines = [line for line in content.split('\n') if line.strip()]
-        
-        # 使用 ast.literal_eval 来解析 Python 字典格式
-        dialogs = []
-        for line in lines:
-            try:
-                dialog = ast.literal_eval(line)
-                dialogs.append(dialog)
-            except Exception as e:
-                continue
-        
-        return dialogs
-        
+        # 多个会话同时刷新时只列出一次
+        with perf_trace.stage("list files"):
+            return get_shared_cache().coalesce(('index', source.describe()), lambda: source.index(ttl=ttl))
+    except DataSourceError as e:
+        st.error(str(e))
+        return {}
+
+def read_eval_metrics(source, file_path, sha):
+    """Parsed metrics of an eval file; the file is read and parsed only once per SHA"""
+    metrics = cached_eval_metrics(sha)
+    if metrics is None:
+        try:
+            metrics = get_shared_cache().coalesce(
+                ('read', sha), lambda: load_eval_metrics(sha, source.read_bytes(file_path, sha=sha))
+            )
+        except DataSourceError as e:
+            st.error(str(e))
+    return metrics
+
+def ingest_file(source, file_path, sha):
+    """Make sure a record file is in the local record store; returns its dialog count"""
+    store = get_store()
+    if not store.has_file(sha):
+        def ingest():
+            # 等待期间其他会话可能已经完成
+            if not store.has_file(sha):
+                with perf_trace.stage("ingest"):
+                    store.ingest(sha, file_path, source.record_file(file_path, sha=sha))
+
+        # 每个文件只下载、解析一次，同时打开同一文件的会话共享这一次
+        try:
+            with st.spinner("Indexing dialogs..."):
+                get_shared_cache().coalesce(('ingest', sha), ingest)
+        except Exception as e:
+            st.error(f"Error processing content: {str(e)}")
+            return 0
+    return store.dialog_count(sha)
+
+def follow_file(source, entry):
+    """Load what was appended to a record file since the last check; returns (store key, dialog count)"""
+    tail = get_tail(source, entry['path'])
+    try:
+        with perf_trace.stage("follow"):
+            tail.poll(get_store(), entry['size'])
     except Exception as e:
-        st.error(f"Error processing content: {str(e)}")
-        return None
+        st.error(f"Error following file: {str(e)}")
+    if tail.polled_at is not None:
+        st.caption(f"📡 Following · {tail.dialogs} dialogs · +{tail.new_dialogs} new at "
+                   f"{time.strftime('%H:%M:%S', time.localtime(tail.polled_at))}")
+    return tail.key, tail.dialogs
 
 def format_file_name(file_name):
     """简化文件名显示"""
@@ -133,8 +120,16 @@ def format_file_name(file_name):
     # 如果格式不匹配，返回简化的原始名称
     return name
 
-def format_dialog(dialog_data):
-    st.markdown("""
+def format_file_path(file_path):
+    """简化文件路径显示，归档目录附加目录后缀"""
+    directory, _, file_name = file_path.rpartition('/')
+    label = format_file_name(file_name)
+    base_dir = directory.rsplit('/', 1)[-1]
+    if '_before_' in base_dir:
+        label = f"{label} · before {base_dir.rsplit('_before_', 1)[1]}"
+    return label
+
+DIALOG_CSS = """
     <style>
         /* 整体页面背景 */
         .stApp {
@@ -280,6 +275,21 @@ def format_dialog(dialog_data):
             transform: translateY(0px);
         }
         
+        /* 单块渲染模式中的折叠区 */
+        .dialog-details {
+            font-size: 14px;
+            margin: 5px 40px;
+            padding: 8px 14px;
+            border-radius: 8px;
+            border: 1px solid #e0e0e0;
+            background-color: white;
+        }
+        
+        .dialog-details summary {
+            color: #546e7a;
+            cursor: pointer;
+        }
+        
         /* 按钮行样式 */
         .button-row {
             display: flex;
@@ -287,23 +297,127 @@ def format_dialog(dialog_data):
             margin: 10px 0;
         }
     </style>
-    """, unsafe_allow_html=True)
+"""
+
+# 长对话分页显示：每页的轮数，以及页前后额外显示的轮数
+TRANSCRIPT_PAGE_TURNS = 10
+TRANSCRIPT_CONTEXT_TURNS = 1
 
+# 每种角色的消息附带的 prompt 字段
+PROMPT_KINDS = {
+    "Recommender": "Recommender_prompt",
+    "Seeker": "Seeker_prompt",
+    "critic": "critic_prompt",
+}
+
+def get_prompt(msg, position, kind, load_prompt):
+    if kind in msg or load_prompt is None:
+        return msg.get(kind) or ""
+    return load_prompt(position, kind) or ""
+
+def lazy_expander(label, key, render):
+    """Expander whose body is only computed and sent while it is open"""
+    expander = st.expander(label, key=key, on_change="rerun")
+    if expander.open:
+        with expander:
+            render()
+
+def escape_block(text):
+    # 整段 HTML 里不能出现空行，否则 markdown 会把后面的内容当作普通文本
+    return html.escape(str(text)).replace("\n", "<br/>")
+
+def render_dialog_html(messages):
+    """Build the whole transcript as one HTML fragment"""
+    parts = []
+    for msg in messages:
+        role = msg.get("role")
+        if role in ("Seeker", "Recommender"):
+            css_class, icon = ("seeker", "👤") if role == "Seeker" else ("recommender", "🤖")
+            parts.append(
+                f'<div class="message {css_class}"><div class="message-icon">{icon}</div>'
+                f'<div class="message-content">{escape_block(msg["content"])}</div></div>'
+            )
+            if role == "Recommender":
+                parts.append(
+                    '<details class="dialog-details"><summary>📋 User Preference</summary>'
+                    f'{escape_block(msg.get("user_preference") or "")}</details>'
+                )
+        elif role == "critic":
+            outputs = "".join(
+                f"<p><b>Output {idx}:</b><br/>{escape_block(content)}</p>"
+                for idx, content in enumerate(msg.get("content", []), 1)
+            )
+            parts.append(
+                f'<div class="reward"><div class="reward-icon">⭐</div><div>Reward: {msg.get("reward", 0)}</div></div>'
+                f'<details class="dialog-details"><summary>📊 Content</summary>{outputs}</details><hr/>'
+            )
+    return "".join(parts)
+
+def show_prompt_picker(messages, load_prompt, key_prefix, offset=0):
+    """One lazily loaded prompt viewer for the whole dialog"""
+    options = [
+        (offset + i, PROMPT_KINDS[msg.get("role")])
+        for i, msg in enumerate(messages)
+        if offset + i > 0 and msg.get("role") in PROMPT_KINDS
+    ]
+    if not options:
+        return
+
+    def render():
+        position, kind = st.selectbox(
+            "Prompt",
+            options,
+            format_func=lambda option: f"Message {option[0] + 1} · {option[1].replace('_', ' ')}",
+            key=f"{key_prefix}-prompt-picker"
+        )
+        st.write(get_prompt(messages[position - offset], position, kind, load_prompt))
+
+    lazy_expander("🧾 Prompts", f"{key_prefix}-prompts", render)
+
+def format_dialog(dialog_data, load_prompt=None, key_prefix="dialog", batched=False):
+    """Render one dialog; load_prompt(position, kind) fetches prompts that are not in dialog_data.
+
+    With batched=True the transcript is sent as a single HTML block and the
+    prompts are browsed through one lazily loaded viewer, so the number of
+    elements no longer grows with the length of the dialog.
+    """
     messages = dialog_data["full_state"]
+    # 分页加载时 messages 只是对话的一段，offset 是第一条消息在整个对话中的位置
+    offset = dialog_data.get("first_position", 0)
+
+    if batched:
+        st.markdown(render_dialog_html(messages), unsafe_allow_html=True)
+        show_prompt_picker(messages, load_prompt, key_prefix, offset)
+        return
+
+    def show_prompt(i, kind):
+        # prompt 只在展开时才读取并发送到浏览器
+        def render():
+            st.write(get_prompt(messages[i], offset + i, kind, load_prompt))
+        return render
+
+    def show_critic_outputs(content_list):
+        def render():
+            for idx, content in enumerate(content_list, 1):
+                st.markdown(f"**Output {idx}:**")
+                st.write(content)
+        return render
     
     # 显示第一个 Seeker 消息
     if messages:
-        first_msg = messages[0]
-        st.markdown(f"""
-            <div class="message seeker">
-                <div class="message-icon">👤</div>
-                <div class="message-content">
-                    {html.escape(first_msg["content"])}
+        i = 0
+        if offset == 0:
+            first_msg = messages[0]
+            st.markdown(f"""
+                <div class="message seeker">
+                    <div class="message-icon">👤</div>
+                    <div class="message-content">
+                        {html.escape(first_msg["content"])}
+                    </div>
                 </div>
-            </div>
-        """, unsafe_allow_html=True)
+            """, unsafe_allow_html=True)
+            i = 1
         
-        i = 1
         while i < len(messages):
             # Recommender
             if i < len(messages) and messages[i]["role"] == "Recommender":
@@ -319,11 +433,11 @@ def format_dialog(dialog_data):
                 
                 col1, col2 = st.columns(2)
                 with col1:
-                    with st.expander("📋 User Preference"):
-                        st.write(msg.get("user_preference", ""))
+                    lazy_expander("📋 User Preference", f"{key_prefix}-{offset + i}-preference",
+                                  lambda msg=msg: st.write(msg.get("user_preference", "")))
                 with col2:
-                    with st.expander("💭 Recommender Prompt"):
-                        st.write(msg.get("Recommender_prompt", ""))
+                    lazy_expander("💭 Recommender Prompt", f"{key_prefix}-{offset + i}-Recommender_prompt",
+                                  show_prompt(i, "Recommender_prompt"))
                 i += 1
             
             # Seeker
@@ -338,8 +452,8 @@ def format_dialog(dialog_data):
                     </div>
                 """, unsafe_allow_html=True)
                 
-                with st.expander("💬 Seeker Prompt"):
-                    st.write(msg.get("Seeker_prompt", ""))
+                lazy_expander("💬 Seeker Prompt", f"{key_prefix}-{offset + i}-Seeker_prompt",
+                              show_prompt(i, "Seeker_prompt"))
                 i += 1
             
             # Critic
@@ -355,20 +469,176 @@ def format_dialog(dialog_data):
                 
                 col1, col2 = st.columns(2)
                 with col1:
-                    with st.expander("📊 Content"):
-                        content_list = msg.get("content", [])
-                        for idx, content in enumerate(content_list, 1):
-                            st.markdown(f"**Output {idx}:**")
-                            st.write(content)
+                    lazy_expander("📊 Content", f"{key_prefix}-{offset + i}-critic_content",
+                                  show_critic_outputs(msg.get("content", [])))
                 with col2:
-                    with st.expander("📝 Critique Prompt"):
-                        st.write(msg.get("critic_prompt", ""))
+                    lazy_expander("📝 Critique Prompt", f"{key_prefix}-{offset + i}-critic_prompt",
+                                  show_prompt(i, "critic_prompt"))
                 i += 1
                 st.markdown("<hr/>", unsafe_allow_html=True)
 
-def display_eval_metrics(file_content):
-    """Display evaluation metrics in a formatted way"""
-    st.markdown("""
+DIALOG_OUTCOMES = {
+    "All": {},
+    "Accepted": {'accepted': True},
+    "Not accepted": {'accepted': False},
+    "No recommendation": {'recommended': False},
+}
+DIALOG_SORTS = {
+    "Dialog": "dialog",
+    "Reward ↑": "reward",
+    "Reward ↓": "reward DESC",
+    "Turns ↑": "turns",
+    "Turns ↓": "turns DESC",
+    "Min critic reward ↑": "min_critic_reward",
+    "Max critic reward ↓": "max_critic_reward DESC",
+}
+DIALOG_FILTER_KEYS = (
+    "dialog_filter_outcome", "dialog_filter_min_reward", "dialog_filter_max_reward",
+    "dialog_filter_min_turns", "dialog_filter_max_turns", "dialog_sort",
+)
+
+def format_dialog_label(row):
+    label = f"Dialog {row['dialog'] + 1}"
+    if row['reward'] is not None:
+        label += f" · reward {row['reward']:.2f}"
+    outcome = "✅" if row['accepted'] else ("❌" if row['recommended'] else "∅")
+    return f"{label} · {row['turns']} turn{'' if row['turns'] == 1 else 's'} · {outcome}"
+
+def show_dialog_filters(store, sha):
+    """Filter and sort controls over the per-dialog summary table; returns {dialog: row} in display order"""
+    # 筛选条件按 key 保存，切换 epoch 文件时保持不变
+    with st.expander("🔎 Filter and sort dialogs"):
+        col1, col2, col3, col4, col5 = st.columns([3, 2, 2, 2, 2])
+        with col1:
+            outcome = st.radio("Outcome", list(DIALOG_OUTCOMES), key="dialog_filter_outcome", horizontal=True,
+                               help="Accepted: the last critic verdict is that the Seeker accepted the recommendation")
+            order_by = st.selectbox("Sort by", list(DIALOG_SORTS), key="dialog_sort")
+        with col2:
+            min_reward = st.number_input("Reward ≥", value=None, step=0.1, key="dialog_filter_min_reward")
+        with col3:
+            max_reward = st.number_input("Reward ≤", value=None, step=0.1, key="dialog_filter_max_reward")
+        with col4:
+            min_turns = st.number_input("Turns ≥", value=None, min_value=0, step=1, key="dialog_filter_min_turns")
+        with col5:
+            max_turns = st.number_input("Turns ≤", value=None, min_value=0, step=1, key="dialog_filter_max_turns")
+
+        reward = None
+        if min_reward is not None or max_reward is not None:
+            reward = (-float('inf') if min_reward is None else min_reward,
+                      float('inf') if max_reward is None else max_reward)
+        turns = None
+        if min_turns is not None or max_turns is not None:
+            turns = (0 if min_turns is None else min_turns, 2 ** 31 if max_turns is None else max_turns)
+        with perf_trace.stage("dialog table"):
+            rows = store.dialog_table(sha, reward=reward, turns=turns, order_by=DIALOG_SORTS[order_by],
+                                      **DIALOG_OUTCOMES[outcome])
+        st.dataframe(rows, hide_index=True, height=min(36 * (len(rows) + 1), 320), width="stretch")
+    return {row['dialog']: row for row in rows}
+
+@st.fragment
+@traced_rerun("transcript")
+def show_dialog_window(store, sha, dialog_index, batched=False):
+    """Render one page of turns of a stored dialog, with one context turn on each side"""
+    last_turn = store.dialog_turns(sha, dialog_index)
+    pages = (last_turn + TRANSCRIPT_PAGE_TURNS) // TRANSCRIPT_PAGE_TURNS
+    page = 0
+    if pages > 1:
+        page = st.select_slider(
+            "Turns",
+            options=range(pages),
+            format_func=lambda p: f"{p * TRANSCRIPT_PAGE_TURNS}–{min((p + 1) * TRANSCRIPT_PAGE_TURNS - 1, last_turn)}",
+            key=f"{sha}-{dialog_index}-page"
+        )
+    first = max(page * TRANSCRIPT_PAGE_TURNS - TRANSCRIPT_CONTEXT_TURNS, 0)
+    last = min((page + 1) * TRANSCRIPT_PAGE_TURNS - 1 + TRANSCRIPT_CONTEXT_TURNS, last_turn)
+    if pages > 1:
+        st.caption(f"Showing turns {first}–{last} of {last_turn}")
+    hit = st.session_state.get("search_hit")
+    if hit and hit['sha'] == sha and hit['dialog'] == dialog_index:
+        st.info(f"🔎 Search match in turn {hit['turn']} ({hit['field']})")
+
+    # 只从 store 读取窗口内的消息，渲染量与对话长度无关
+    with perf_trace.stage("load dialog"):
+        dialog_data = store.load_dialog(sha, dialog_index, with_prompts=False, turns=(first, last))
+    with perf_trace.stage("format dialog"):
+        format_dialog(
+            dialog_data,
+            load_prompt=lambda position, kind: store.load_prompt(sha, dialog_index, position, kind),
+            key_prefix=f"{sha}-{dialog_index}",
+            batched=batched
+        )
+
+SEARCH_LIMIT = 50
+
+def highlight_snippet(snippet):
+    return html.escape(snippet).replace('\x02', '<mark>').replace('\x03', '</mark>')
+
+def open_search_hit(hit):
+    """Switch to the conversation view at the dialog and page of a search hit"""
+    st.session_state.view_selector = "Conversation History"
+    # 清除对话筛选条件，保证命中的对话在选择列表中
+    for key in DIALOG_FILTER_KEYS:
+        st.session_state.pop(key, None)
+    st.session_state.file_selector = hit['path']
+    st.session_state.dialog_selector = hit['dialog']
+    st.session_state[f"{hit['sha']}-{hit['dialog']}-page"] = hit['turn'] // TRANSCRIPT_PAGE_TURNS
+    st.session_state.search_hit = hit
+
+def display_search(source, follow=False):
+    """Full-text search over the dialogs of every indexed record file"""
+    store = get_store()
+    if not store.searchable:
+        st.error("Full-text search needs SQLite with the FTS5 extension.")
+        return
+
+    entries = list_data_files(get_data_index(source, FOLLOW_INTERVAL if follow else None), "data/conversation_history")
+    missing = [entry for entry in entries if not store.has_file(entry['sha'])]
+    if missing:
+        col1, col2 = st.columns([5, 1])
+        with col1:
+            st.caption(f"{len(missing)} of {len(entries)} record files are not indexed yet; "
+                       "the search covers the others")
+        with col2:
+            index_all = st.button("Index all", key="search_index_all")
+        if index_all:
+            # 每个文件只需建一次索引，之后随新文件增量更新
+            progress = st.progress(0.0)
+            for i, entry in enumerate(missing, 1):
+                ingest_file(source, entry['path'], entry['sha'])
+                progress.progress(i / len(missing), text=f"Indexed {i}/{len(missing)} files")
+            st.rerun()
+
+    col1, col2 = st.columns([3, 2])
+    with col1:
+        query = st.text_input("Search dialogs", key="search_query",
+                              placeholder="e.g. comedy, family friendly, recommend*")
+    with col2:
+        fields = st.multiselect("Fields", SEARCH_FIELDS, default=list(SEARCH_FIELDS), key="search_fields")
+    if not query:
+        return
+
+    start = time.perf_counter()
+    with perf_trace.stage("search"):
+        hits = store.search(query, shas=[entry['sha'] for entry in entries] + tail_keys(source),
+                            fields=fields, limit=SEARCH_LIMIT)
+    elapsed = time.perf_counter() - start
+    more = f" (best {SEARCH_LIMIT})" if len(hits) == SEARCH_LIMIT else ""
+    st.caption(f"{len(hits)} hits{more} in {elapsed * 1000:.1f} ms")
+
+    for i, hit in enumerate(hits):
+        col1, col2 = st.columns([8, 1])
+        with col1:
+            st.markdown(
+                f"**{html.escape(format_file_path(hit['path']))}** · Dialog {hit['dialog'] + 1} · "
+                f"Turn {hit['turn']} · {hit['field']}<br>{highlight_snippet(hit['snippet'])}",
+                unsafe_allow_html=True
+            )
+        with col2:
+            # 跟随模式下本视图运行在 fragment 中，按钮只重跑 fragment；需重跑整个页面才能切换视图
+            if st.button("Open", key=f"search_open_{i}", on_click=open_search_hit, args=(hit,)):
+                st.rerun(scope="app")
+
+EVAL_METRICS_CSS = """
         <style>
         /* 整体页面样式 */
         .stApp {
@@ -495,40 +765,30 @@ def display_eval_metrics(file_content):
             animation: fadeIn 0.5s ease-out;
         }
         </style>
-    """, unsafe_allow_html=True)
+"""
+
+def display_eval_metrics(metrics):
+    """Display evaluation metrics in a formatted way"""
+    with perf_trace.stage("eval metrics css"):
+        st.markdown(EVAL_METRICS_CSS, unsafe_allow_html=True)
 
     # 创建主要指标容器
     st.markdown('<div class="metric-container">', unsafe_allow_html=True)
     st.markdown('<div class="metric-header">📊 Overall Metrics</div>', unsafe_allow_html=True)
     
-    # 提取主要指标
-    lines = file_content.split('\n')
-    for line in lines:
-        if "Testing SR:" in line:
-            sr = line.split("Testing SR:")[1].strip().split()[0]
-            st.markdown(f"""
-                <div class="metric-value">
-                    <span class="metric-icon">🎯</span>
-                    <span class="metric-label">Success Rate</span>
-                    <span class="metric-number">{sr}</span>
-                </div>
-            """, unsafe_allow_html=True)
-        elif "Testing Avg@T:" in line:
-            avg_t = line.split("Testing Avg@T:")[1].strip().split()[0]
-            st.markdown(f"""
-                <div class="metric-value">
-                    <span class="metric-icon">⏱️</span>
-                    <span class="metric-label">Average Turns</span>
-                    <span class="metric-number">{avg_t}</span>
-                </div>
-            """, unsafe_allow_html=True)
-        elif "Testing Rewards:" in line:
-            rewards = line.split("Testing Rewards:")[1].strip().split()[0]
+    # 主要指标
+    overall = [
+        ("🎯", "Success Rate", metrics.sr),
+        ("⏱️", "Average Turns", metrics.avg_turns),
+        ("🌟", "Rewards", metrics.rewards),
+    ]
+    for icon, label, value in overall:
+        if value is not None:
             st.markdown(f"""
                 <div class="metric-value">
-                    <span class="metric-icon">🌟</span>
-                    <span class="metric-label">Rewards</span>
-                    <span class="metric-number">{rewards}</span>
+                    <span class="metric-icon">{icon}</span>
+                    <span class="metric-label">{label}</span>
+                    <span class="metric-number">{value}</span>
                 </div>
             """, unsafe_allow_html=True)
     st.markdown('</div>', unsafe_allow_html=True)
@@ -539,10 +799,8 @@ def display_eval_metrics(file_content):
     
     # 创建网格布局来展示回合指标
     st.markdown('<div class="turn-metrics">', unsafe_allow_html=True)
-    for line in lines:
-        if "Testing SR-turn@" in line:
-            turn_num = line.split("@")[1].split(":")[0]
-            value = line.split(":")[1].strip()
+    for turn_num, value in enumerate(metrics.sr_turns):
+        if value is not None:
             st.markdown(f"""
                 <div class="metric-value">
                     <span class="metric-icon">🔄</span>
@@ -552,12 +810,115 @@ def display_eval_metrics(file_content):
             """, unsafe_allow_html=True)
     st.markdown('</div></div>', unsafe_allow_html=True)
 
-def display_metrics_analysis(data_path, github_token):
-    """Display metrics analysis with line charts"""
-    # 定义 GitHub 仓库信息
-    REPO_OWNER = "ym689"
-    REPO_NAME = "dialog-visualizer"
+# 每个整体指标是越大越好还是越小越好
+METRIC_GOALS = {'Success Rate': True, 'Average Turns': False, 'Rewards': True}
+
+def show_matrix_controls(table):
+    """Series selection, epoch filter, smoothing and best-epoch summary; returns the table to plot"""
+    import numpy as np
+
+    labels = list(table)
+    if len(labels) > 1:
+        labels = st.multiselect("Runs", labels, default=labels, key="analysis_series")
+    table = {label: table[label] for label in labels}
+    if not table:
+        return table
+
+    first = min(int(matrix.epochs.min()) for matrix in table.values())
+    last = max(int(matrix.epochs.max()) for matrix in table.values())
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        if first < last:
+            first, last = st.slider("Epochs", first, last, (first, last), key="analysis_epochs")
+    with col2:
+        window = st.selectbox("Moving average", [1, 2, 3, 5], key="analysis_window",
+                              format_func=lambda w: "Off" if w == 1 else f"{w} epochs")
+    table = {label: matrix.epoch_range(first, last) for label, matrix in table.items()}
+
+    # 最佳 epoch 及最近一个 epoch 相对前一个的变化
+    if len(table) == 1:
+        matrix = next(iter(table.values()))
+        deltas = matrix.deltas()
+        columns = st.columns(len(OVERALL_METRICS))
+        for column, (j, metric_name) in zip(columns, enumerate(OVERALL_METRICS)):
+            best = matrix.best_epoch(metric_name, maximize=METRIC_GOALS[metric_name])
+            if best is None:
+                continue
+            delta = deltas[-1, j] if len(deltas) and not np.isnan(deltas[-1, j]) else None
+            column.metric(
+                f"Best {metric_name} (epoch {best[0]})",
+                f"{best[1]:.4f}",
+                delta=None if delta is None else f"{delta:+.4f} last epoch",
+                delta_color="normal" if METRIC_GOALS[metric_name] else "inverse"
+            )
+    else:
+        rows = []
+        for label, matrix in table.items():
+            row = {"Run": label, "Epochs": len(matrix)}
+            for metric_name in OVERALL_METRICS:
+                best = matrix.best_epoch(metric_name, maximize=METRIC_GOALS[metric_name])
+                row[f"Best {metric_name}"] = None if best is None else round(best[1], 4)
+                row[f"{metric_name} epoch"] = None if best is None else best[0]
+            rows.append(row)
+        st.dataframe(rows, hide_index=True, width="stretch")
+    return {label: matrix.moving_average(window) for label, matrix in table.items() if len(matrix)}
+
+def add_series_traces(fig, table, column_values, name):
+    """One trace per run; column_values(matrix) picks the plotted column"""
+    import numpy as np
+    import plotly.graph_objects as go
+    from charts import SERIES_COLORS
+
+    with perf_trace.stage("build figures"):
+        for k, (label, matrix) in enumerate(table.items()):
+            values = column_values(matrix)
+            valid = ~np.isnan(values)
+            if valid.any():
+                fig.add_trace(go.Scatter(
+                    x=matrix.epochs[valid],
+                    y=values[valid],
+                    mode='lines+markers',
+                    name=label if len(table) > 1 else name,
+                    line=dict(color=SERIES_COLORS[k % len(SERIES_COLORS)], width=2),
+                    marker=dict(size=8)
+                ))
+    return len(fig.data) > 0
+
+def plot_chart(fig):
+    # 序列化图表并发送到浏览器
+    with perf_trace.stage("plotly chart"):
+        st.plotly_chart(fig, width="stretch")
+
+def load_eval_metrics_for(source, files):
+    """{sha: EvalMetrics} for eval file entries, reading only files never parsed before"""
+    # 已解析过的文件直接使用缓存结果，其余的由数据源读取
+    parsed = {}
+    unparsed = []
+    for entry in files:
+        metrics = cached_eval_metrics(entry['sha'])
+        if metrics is not None:
+            parsed[entry['sha']] = metrics
+        else:
+            unparsed.append(entry)
+    
+    # 多个会话同时打开分析页时，相同的一批文件只读取一次
+    contents, errors = get_shared_cache().coalesce(
+        ('read_many', source.describe(), tuple(entry['sha'] for entry in unparsed)),
+        lambda: source.read_many(unparsed)
+    )
+    for file, error in errors.items():
+        st.error(f"Error processing file {file}: {error}")
     
+    shas = {entry['path']: entry['sha'] for entry in unparsed}
+    for file, content in contents.items():
+        try:
+            parsed[shas[file]] = load_eval_metrics(shas[file], content)
+        except Exception as e:
+            st.error(f"Error processing file {file}: {str(e)}")
+    return parsed
+
+def display_metrics_analysis(data_path, source, follow=False):
+    """Display metrics analysis with line charts"""
     # 添加刷新按钮
     if st.button("🔄 Refresh Analysis"):
         st.rerun()
@@ -594,186 +955,203 @@ def display_metrics_analysis(data_path, github_token):
         </style>
     """, unsafe_allow_html=True)
 
-    # 获取所有文件
-    files = get_github_files(REPO_OWNER, REPO_NAME, data_path, github_token)
+    # 获取所有文件（包括归档目录）
+    files = list_data_files(get_data_index(source, FOLLOW_INTERVAL if follow else None), data_path)
     if not files:
         st.error("No files found for analysis.")
         return
         
     # 添加加载提示
     with st.spinner('Loading metrics data...'):
-        metrics_data = {
-            'overall': {
-                'Success Rate': [],
-                'Average Turns': [],
-                'Rewards': []
-            },
-            'turn_based': {}
-        }
-        
-        # 读取所有文件数据
-        for file in files:
-            try:
-                file_path = f"{data_path}/{file}"
-                encoded_path = urllib.parse.quote(file_path)
-                url = f"https://api.github.com/repos/{REPO_OWNER}/{REPO_NAME}/contents/{encoded_path}"
-                
-                headers = {
-                    "Authorization": f"token {github_token}",
-                    "Accept": "application/vnd.github.v3+json"
-                }
-                response = requests.get(url, headers=headers)
-                
-                if response.status_code == 200:
-                    content = base64.b64decode(response.json()['content']).decode('utf-8')
-                    lines = content.split('\n')
-                    
-                    # 提取epoch数字 - 更新提取逻辑
-                    try:
-                        # 从文件名中提取epoch数字
-                        parts = file.split('-')
-                        for i, part in enumerate(parts):
-                            if part == 'epoch' and i + 1 < len(parts):
-                                file_id = int(parts[i + 1])
-                                break
-                        else:
-                            continue  # 如果没有找到epoch数字，跳过此文件
-                    except (ValueError, IndexError):
-                        continue  # 如果解析失败，跳过此文件
-                    
-                    # 解析数据
-                    for line in lines:
-                        if "Testing SR:" in line:
-                            try:
-                                sr = float(line.split("Testing SR:")[1].strip().split()[0])
-                                metrics_data['overall']['Success Rate'].append((file_id, sr))
-                            except (ValueError, IndexError):
-                                continue
-                        elif "Testing Avg@T:" in line:
-                            try:
-                                avg_t = float(line.split("Testing Avg@T:")[1].strip().split()[0])
-                                metrics_data['overall']['Average Turns'].append((file_id, avg_t))
-                            except (ValueError, IndexError):
-                                continue
-                        elif "Testing Rewards:" in line:
-                            try:
-                                rewards = float(line.split("Testing Rewards:")[1].strip().split()[0])
-                                metrics_data['overall']['Rewards'].append((file_id, rewards))
-                            except (ValueError, IndexError):
-                                continue
-                        elif "Testing SR-turn@" in line:
-                            try:
-                                turn_num = line.split("@")[1].split(":")[0]
-                                value = float(line.split(":")[1].strip())
-                                if turn_num not in metrics_data['turn_based']:
-                                    metrics_data['turn_based'][turn_num] = []
-                                metrics_data['turn_based'][turn_num].append((file_id, value))
-                            except (ValueError, IndexError):
-                                continue
-            except Exception as e:
-                st.error(f"Error processing file {file}: {str(e)}")
-                continue
+        # 文件名解析为 (run, model, epoch, version)，只处理新增或变化的文件
+        from run_index import get_run_index
+        run_index = get_run_index()
+        with perf_trace.stage("run index"):
+            changed = run_index.update(files)
+        if follow:
+            st.caption(f"📡 Following · {len(files)} files · +{changed} new or changed at "
+                       f"{time.strftime('%H:%M:%S')}")
+        with perf_trace.stage("load metrics"):
+            metrics = load_eval_metrics_for(source, files)
+        with perf_trace.stage("metrics table"):
+            table = run_index.metrics_table(metrics)
+        skipped = sorted(path for path in run_index.unparsed if path.startswith(data_path))
+        if skipped:
+            st.caption(f"Skipped {len(skipped)} files with unrecognized names: "
+                       + ", ".join(path.rsplit('/', 1)[-1] for path in skipped))
+        if not table:
+            st.error("No metrics found for analysis.")
+            return
+
+    # 控件与图表放在 fragment 中：调整时只重跑这一部分，不重新列出与读取文件
+    show_metrics_panel(table)
 
-        # 对数据点进行排序
-        for metric in metrics_data['overall'].values():
-            metric.sort(key=lambda x: x[0])
-        for turn_data in metrics_data['turn_based'].values():
-            turn_data.sort(key=lambda x: x[0])
+@st.fragment
+@traced_rerun("metrics panel")
+def show_metrics_panel(table):
+    """Run, epoch and smoothing controls with the charts they drive"""
+    import numpy as np
+    import plotly.graph_objects as go
+    import charts
 
-        # 创建整体指标图表
+    table = show_matrix_controls(table)
+    if not table:
+        return
+    turn_count = charts.turn_count(table)
+
+    layout = st.radio("Charts", ["Compact", "Heatmap", "Per metric"], horizontal=True, key="analysis_layout")
+    if layout != "Per metric":
+        # 整体指标一个子图网格、回合指标一个图；相同数据复用同一个图对象
         st.markdown('<div class="metrics-container">', unsafe_allow_html=True)
         st.markdown('<div class="chart-title">Overall Metrics</div>', unsafe_allow_html=True)
-        
-        col1, col2 = st.columns(2)
-        
-        # 绘制整体指标图表
-        for i, (metric_name, metric_data) in enumerate(metrics_data['overall'].items()):
-            with col1 if i % 2 == 0 else col2:
-                if metric_data:
-                    x_values = [x[0] for x in metric_data]
-                    y_values = [x[1] for x in metric_data]
-                    
-                    fig = go.Figure()
-                    fig.add_trace(go.Scatter(
-                        x=x_values,
-                        y=y_values,
-                        mode='lines+markers',
-                        name=metric_name,
-                        line=dict(color='#6c5ce7', width=2),
-                        marker=dict(size=8)
-                    ))
-                    
-                    fig.update_layout(
-                        title=metric_name,
-                        xaxis_title="Epoch",
-                        yaxis_title="Value",
-                        showlegend=False,
-                        height=300,
-                        margin=dict(l=40, r=40, t=40, b=40)
-                    )
-                    
-                    st.plotly_chart(fig, use_container_width=True)
-
+        plot_chart(charts.cached_figure("overall", table, charts.overall_grid))
         st.markdown('</div>', unsafe_allow_html=True)
-        
-        # 添加分割线
         st.markdown('<div class="metrics-divider"></div>', unsafe_allow_html=True)
-        
-        # 创建回合指标图表
         st.markdown('<div class="metrics-container">', unsafe_allow_html=True)
         st.markdown('<div class="chart-title">Turn-based Success Rate</div>', unsafe_allow_html=True)
-        
-        # 对回合指标进行排序
-        sorted_turns = sorted(metrics_data['turn_based'].keys(), key=lambda x: int(x))
-        
-        # 创建两列布局
-        col1, col2 = st.columns(2)
-        
-        # 绘制回合指标图表
-        for i, turn_num in enumerate(sorted_turns):
-            with col1 if i % 2 == 0 else col2:
-                turn_data = metrics_data['turn_based'][turn_num]
-                if turn_data:
-                    x_values = [x[0] for x in turn_data]
-                    y_values = [x[1] for x in turn_data]
-                    
-                    fig = go.Figure()
-                    fig.add_trace(go.Scatter(
-                        x=x_values,
-                        y=y_values,
-                        mode='lines+markers',
-                        name=f'Turn {turn_num}',
-                        line=dict(color='#6c5ce7', width=2),
-                        marker=dict(size=8)
-                    ))
-                    
-                    fig.update_layout(
-                        title=f'Success Rate at Turn {turn_num}',
-                        xaxis_title="Epoch",
-                        yaxis_title="Success Rate",
-                        showlegend=False,
-                        height=300,
-                        margin=dict(l=40, r=40, t=40, b=40)
-                    )
-                    
-                    st.plotly_chart(fig, use_container_width=True)
-        
+        # 没有任何 SR-turn@k 时无法构造子图，只给出提示
+        if turn_count == 0:
+            st.caption("No SR-turn@k metrics in the selected eval files.")
+        elif layout == "Heatmap":
+            plot_chart(charts.cached_figure("turn_heatmap", table, charts.turn_heatmap))
+        else:
+            plot_chart(charts.cached_figure("turn_curves", table, charts.turn_curves))
         st.markdown('</div>', unsafe_allow_html=True)
+        return
 
-def view_dialog(file_path):
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-            # 找到第一个有效的 JSON 对象
-            start = content.find('{')
-            end = content.rfind('}') + 1
-            if start >= 0 and end > start:
-                dialog_data = json.loads(content[start:end])
-                format_dialog(dialog_data)
+    # 创建整体指标图表
+    st.markdown('<div class="metrics-container">', unsafe_allow_html=True)
+    st.markdown('<div class="chart-title">Overall Metrics</div>', unsafe_allow_html=True)
+    
+    col1, col2 = st.columns(2)
+    
+    # 绘制整体指标图表，每个 run 一条曲线
+    for i, metric_name in enumerate(OVERALL_METRICS):
+        with col1 if i % 2 == 0 else col2:
+            fig = go.Figure()
+            if add_series_traces(fig, table, lambda matrix: matrix.metric(metric_name), metric_name):
+                fig.update_layout(
+                    title=metric_name,
+                    xaxis_title="Epoch",
+                    yaxis_title="Value",
+                    showlegend=len(table) > 1,
+                    height=300,
+                    margin=dict(l=40, r=40, t=40, b=40)
+                )
+                
+                plot_chart(fig)
+
+    st.markdown('</div>', unsafe_allow_html=True)
+    
+    # 添加分割线
+    st.markdown('<div class="metrics-divider"></div>', unsafe_allow_html=True)
+    
+    # 创建回合指标图表
+    st.markdown('<div class="metrics-container">', unsafe_allow_html=True)
+    st.markdown('<div class="chart-title">Turn-based Success Rate</div>', unsafe_allow_html=True)
+    
+    # 创建两列布局
+    col1, col2 = st.columns(2)
+    
+    # 绘制回合指标图表
+    for i, turn_num in enumerate(range(turn_count)):
+        with col1 if i % 2 == 0 else col2:
+            fig = go.Figure()
+            column_values = lambda matrix: (
+                matrix.turns[:, turn_num] if turn_num < matrix.turns.shape[1]
+                else np.full(len(matrix), np.nan)
+            )
+            if add_series_traces(fig, table, column_values, f'Turn {turn_num}'):
+                fig.update_layout(
+                    title=f'Success Rate at Turn {turn_num}',
+                    xaxis_title="Epoch",
+                    yaxis_title="Success Rate",
+                    showlegend=len(table) > 1,
+                    height=300,
+                    margin=dict(l=40, r=40, t=40, b=40)
+                )
+                
+                plot_chart(fig)
+    
+    st.markdown('</div>', unsafe_allow_html=True)
+
+def show_instrumentation_panel(source):
+    """Sidebar panel with the data source, the GitHub rate-limit budget and cache counters"""
+    label = "📡 GitHub API" if source.kind == "github" else "📁 Local data"
+    with st.sidebar.expander(label, expanded=False):
+        st.caption(source.describe())
+        if source.kind == "github":
+            rate_limit = github_fetch.rate_limit
+            if rate_limit:
+                st.metric("Rate limit remaining", f"{rate_limit['remaining']} / {rate_limit.get('limit', '?')}")
+                if 'reset' in rate_limit:
+                    reset_in = max(0, int(rate_limit['reset'] - time.time()))
+                    st.caption(f"Resets in {reset_in // 60} min {reset_in % 60} s")
             else:
-                st.error("No valid JSON data found in file")
-    except Exception as e:
-        st.error(f"Error loading dialog: {str(e)}")
+                st.caption("No GitHub requests made yet.")
+            
+            stats = github_fetch.get_listing_stats()
+            st.markdown(
+                f"**Listings** — network: {stats['network']}, "
+                f"304: {stats['not_modified']}, within TTL: {stats['fresh']}"
+            )
+        
+        cache_stats = get_cache().stats()
+        st.markdown(
+            f"**Blob cache** — hits: {cache_stats['hits']}, misses: {cache_stats['misses']}, "
+            f"{cache_stats['bytes'] / 1024 / 1024:.1f} MB used"
+        )
+        shared = get_shared_cache().stats()
+        st.markdown(
+            f"**Shared cache** — requests: {shared['requests']}, hits: {shared['hits']}, "
+            f"coalesced: {shared['coalesced']}, loads: {shared['loads']}, "
+            f"duplicate loads: {shared['duplicate_loads']}, evictions: {shared['evictions']}, "
+            f"{shared['entries']} entries, {shared['bytes'] / 1024 / 1024:.1f} MB"
+        )
+
+def hit_rate(hits, lookups):
+    return f"{hits / lookups:.0%} of {lookups}" if lookups else "no lookups"
+
+def show_perf_panel(container):
+    """Sidebar panel with the stage timings, bytes read, cache hit rates and peak memory of the last rerun"""
+    history = st.session_state.get("perf_history", [])
+    with container.expander("⏱️ Performance", expanded=False):
+        # tracemalloc 是进程级的，开关对所有会话生效
+        st.session_state.perf_track_memory = perf_trace.memory_tracked()
+        st.toggle("Track peak memory", key="perf_track_memory",
+                  on_change=lambda: perf_trace.track_memory(st.session_state.perf_track_memory),
+                  help="Uses tracemalloc, which slows the whole app down while it is on")
+        if not history:
+            st.caption("No reruns recorded yet.")
+            return
+
+        trace = history[-1]
+        peak = "" if trace['memory_peak'] is None else f", peak memory {trace['memory_peak'] / 1024 / 1024:.1f} MB"
+        st.markdown(f"**Last {trace['name']} rerun** — {trace['elapsed'] * 1000:.0f} ms, "
+                    f"{trace['bytes'] / 1024:.1f} KB read{peak}")
+        # 阶段可以嵌套，耗时包含内层阶段
+        st.dataframe([
+            {"Stage": name, "Calls": stage['calls'], "ms": round(stage['seconds'] * 1000, 1),
+             "KB": round(stage['bytes'] / 1024, 1)}
+            for name, stage in sorted(trace['stages'].items(), key=lambda item: -item[1]['seconds'])
+        ], hide_index=True, width="stretch")
+
+        blob = trace['counters']['blob cache']
+        shared = trace['counters']['shared cache']
+        listings = trace['counters']['listings']
+        st.markdown(
+            f"**Hit rates** — blob cache: {hit_rate(blob['hits'], blob['hits'] + blob['misses'])}, "
+            f"shared cache: {hit_rate(shared['hits'] + shared['coalesced'], shared['requests'])}, "
+            f"listings: {hit_rate(listings['fresh'] + listings['not_modified'], sum(listings.values()))}"
+        )
+
+        # 片段重跑不会重绘侧栏，在这里一并列出
+        st.caption("Recent reruns: " + ", ".join(
+            f"{recent['name']} {recent['elapsed'] * 1000:.0f} ms" for recent in reversed(history[-8:])
+        ))
+        # 点击下载时才生成内容，也不触发重跑
+        st.download_button("Export JSON lines", lambda: perf_trace.to_jsonl(history), file_name="perf-trace.jsonl",
+                           mime="application/x-ndjson", key="perf_export", on_click="ignore")
 
 def show_login_page():
     st.markdown("""
@@ -883,14 +1261,26 @@ def main():
         show_login_page()
         return
 
+    # 数据源由配置决定：GitHub 仓库（默认）或本地/挂载目录
     try:
-        GITHUB_TOKEN = st.secrets["GITHUB_TOKEN"]
-    except Exception as e:
-        st.error(f"Error reading GitHub token: {str(e)}")
+        source = get_data_source()
+    except DataSourceError as e:
+        st.error(str(e))
         return
 
-    REPO_OWNER = "ym689"
-    REPO_NAME = "dialog-visualizer"
+    show_instrumentation_panel(source)
+    # 性能面板的位置在此占好，内容等本次重跑结束、各阶段耗时已知后再写入
+    perf_panel = st.sidebar.container()
+    with traced_rerun("script"):
+        show_page(source)
+    show_perf_panel(perf_panel)
+
+def show_page(source):
+    """Follow toggle, header with the view selector, and the selected view"""
+    follow = st.sidebar.toggle(
+        "📡 Follow new data", key="follow_mode",
+        help=f"Check the data source every {FOLLOW_INTERVAL:g}s and load only appended dialogs and new epochs"
+    )
 
     # Add menu selection
     col1, col2, col3 = st.columns([10, 2, 2])
@@ -899,7 +1289,7 @@ def main():
     with col2:
         selected_view = st.selectbox(
             "Select View",
-            ["Conversation History", "Eval Metrics", "Metrics Analysis"],
+            ["Conversation History", "Eval Metrics", "Metrics Analysis", "Search"],
             key="view_selector",
             label_visibility="collapsed"
         )
@@ -908,12 +1298,32 @@ def main():
             st.session_state.authenticated = False
             st.rerun()
 
+    # 长时间无人跟随的文件不再保留其增量数据
+    drop_idle_tails(get_store())
+
+    # 对话样式表放在所有 fragment 之外：每次完整重跑注入一次，fragment 重跑时不再发送
+    if selected_view == "Conversation History":
+        st.markdown(DIALOG_CSS, unsafe_allow_html=True)
+
+    # 跟随模式下只有视图部分按间隔重跑，每次只读取新增的数据
+    if follow:
+        st.fragment(show_view, run_every=FOLLOW_INTERVAL)(source, selected_view, follow)
+    else:
+        show_view(source, selected_view)
+
+@traced_rerun("view")
+def show_view(source, selected_view, follow=False):
+    """Render the selected view; in follow mode it is rerun on an interval"""
     if selected_view == "Metrics Analysis":
         # Only show analysis graphs
         DATA_PATH = "data/eval_metrics"
-        display_metrics_analysis(DATA_PATH, GITHUB_TOKEN)
+        display_metrics_analysis(DATA_PATH, source, follow)
         return  # Exit early to avoid showing other content
 
+    if selected_view == "Search":
+        display_search(source, follow)
+        return
+
     # Set the appropriate data path based on selection
     if selected_view == "Conversation History":
         DATA_PATH = "data/conversation_history"
@@ -922,44 +1332,66 @@ def main():
         DATA_PATH = "data/eval_metrics"
         display_conversation = False
 
-    available_files = get_github_files(REPO_OWNER, REPO_NAME, DATA_PATH, GITHUB_TOKEN)
-    if not available_files:
+    # 一次即可列出所有目录（包括归档目录）
+    entries = list_data_files(get_data_index(source, FOLLOW_INTERVAL if follow else None), DATA_PATH)
+    if not entries:
         st.error(f"No files found in {DATA_PATH}.")
         return
+    show_file_picker(source, entries, display_conversation, follow)
+
+@st.fragment
+@traced_rerun("file picker")
+def show_file_picker(source, entries, display_conversation, follow=False):
+    """File selector and the file's content; picking a file reruns only this part"""
+    available_files = [entry['path'] for entry in entries]
+    file_entries = {entry['path']: entry for entry in entries}
 
-    selected_file = st.selectbox("Select File", available_files, format_func=format_file_name)
+    selected_file = st.selectbox("Select File", available_files, format_func=format_file_path,
+                                 key="file_selector")
     
     if selected_file:
         if display_conversation:
-            dialogs = read_github_file(REPO_OWNER, REPO_NAME, f"{DATA_PATH}/{selected_file}", GITHUB_TOKEN)
-            if dialogs:
-                dialog_index = st.selectbox(
-                    "Select Dialog",
-                    range(len(dialogs)),
-                    format_func=lambda x: f"Dialog {x+1}"
-                )
-                
-                if st.button("🔄 Refresh Dialog"):
-                    st.rerun()
-                    
-                format_dialog(dialogs[dialog_index])
+            if follow:
+                sha, dialog_count = follow_file(source, file_entries[selected_file])
+            else:
+                sha = file_entries[selected_file]['sha']
+                dialog_count = ingest_file(source, selected_file, sha)
+            if dialog_count:
+                summary = get_store().file_summary(sha)
+                st.caption(f"{summary['dialogs']} dialogs · mean reward {summary['mean_reward']:.3f} · "
+                           f"{summary['mean_messages']:.1f} messages per dialog")
+                show_dialog_picker(get_store(), sha)
         else:
             # Display eval metrics
-            file_path = f"{DATA_PATH}/{selected_file}"
-            encoded_path = urllib.parse.quote(file_path)
-            url = f"https://api.github.com/repos/{REPO_OWNER}/{REPO_NAME}/contents/{encoded_path}"
-            
-            headers = {
-                "Authorization": f"token {GITHUB_TOKEN}",
-                "Accept": "application/vnd.github.v3+json"
-            }
-            response = requests.get(url, headers=headers)
+            metrics = read_eval_metrics(source, selected_file, file_entries[selected_file]['sha'])
             
-            if response.status_code == 200:
-                content = base64.b64decode(response.json()['content']).decode('utf-8')
-                display_eval_metrics(content)
-            else:
-                st.error(f"Error fetching file: {response.status_code}")
+            if metrics is not None:
+                with perf_trace.stage("eval metrics"):
+                    display_eval_metrics(metrics)
+
+@st.fragment
+@traced_rerun("dialog picker")
+def show_dialog_picker(store, sha):
+    """Dialog filters and selector; switching dialogs reruns only this part and the transcript"""
+    dialogs = show_dialog_filters(store, sha)
+    if not dialogs:
+        st.warning("No dialogs match the filters.")
+        return
+    dialog_index = st.selectbox(
+        "Select Dialog",
+        list(dialogs),
+        format_func=lambda x: format_dialog_label(dialogs[x]),
+        key="dialog_selector"
+    )
+    
+    if st.button("🔄 Refresh Dialog"):
+        st.rerun()
+
+    batched = st.toggle("⚡ Single-block rendering", key="batched_render",
+                        help="Send the transcript as one HTML block; prompts open in a single viewer")
+    
+    # 对话本身不带 prompt，展开对应的 expander 时才按需重建
+    show_dialog_window(store, sha, dialog_index, batched)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file